@@ -8,7 +8,14 @@ import locale
 from flask.cli import with_appcontext
 import shutil
 import os
-from sqlalchemy import create_engine, text, inspect
+from collections import OrderedDict, namedtuple
+from functools import wraps
+from threading import Lock
+from time import monotonic
+from sqlalchemy import create_engine, text, inspect, func, case, select, event
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import selectinload, aliased, object_session
+from sqlalchemy.orm.util import identity_key
 from dotenv import load_dotenv
 
 # 環境変数の読み込み
@@ -38,6 +45,9 @@ else:
 
 app.config['SESSION_COOKIE_NAME'] = 'yosan_session'
 
+# 物件一覧の1ページあたりの件数
+app.config['PROJECTS_PER_PAGE'] = int(os.getenv('PROJECTS_PER_PAGE', 50))
+
 # データベースURLの設定
 DATABASE_URL = os.getenv('DATABASE_URL')
 if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
@@ -94,6 +104,9 @@ app.jinja_env.filters['format_currency'] = format_currency
 app.jinja_env.filters['subtract'] = subtract
 app.jinja_env.filters['starts_with'] = starts_with
 
+# 工種ごとの支払い集計値（WorkType.payment_totals）
+PaymentTotals = namedtuple('PaymentTotals', 'total_payments contract_total non_contract_total profit_amount')
+
 # モデル定義
 class Project(db.Model):
     __tablename__ = 'projects'
@@ -125,22 +138,36 @@ class Project(db.Model):
             return ((self.contract_amount - self.current_budget_amount) / self.contract_amount) * 100
         return self.initial_profit_rate
 
-    @property
+    @hybrid_property
+    def work_type_budget_total(self):
+        """全工種の予算額合計"""
+        return sum(work_type.budget_amount for work_type in self.work_types)
+
+    @work_type_budget_total.expression
+    def work_type_budget_total(cls):
+        return select(func.coalesce(func.sum(WorkType.budget_amount), 0))\
+            .where(WorkType.project_id == cls.id)\
+            .scalar_subquery()
+
+    @hybrid_property
     def budget_difference(self):
         """予算増減額を計算（当初予算 - 工種予算合計）"""
-        # 全工種の予算額合計を計算
-        total_work_type_budget = sum(work_type.budget_amount for work_type in self.work_types)
+        total_work_type_budget = self.work_type_budget_total
         
         # 工種がある場合は（当初予算 - 工種合計）を返す
         if total_work_type_budget > 0:
             return self.budget_amount - total_work_type_budget
         return 0
 
-    @property
+    @budget_difference.expression
+    def budget_difference(cls):
+        total_work_type_budget = cls.work_type_budget_total
+        return case((total_work_type_budget > 0, cls.budget_amount - total_work_type_budget), else_=0)
+
+    @hybrid_property
     def current_budget(self):
         """現在の実行予算額を計算"""
-        # 全工種の予算額合計を計算
-        total_work_type_budget = sum(work_type.budget_amount for work_type in self.work_types)
+        total_work_type_budget = self.work_type_budget_total
         
         # 工種がある場合は工種合計、ない場合は当初予算を返す
         return total_work_type_budget if total_work_type_budget > 0 else self.budget_amount
@@ -150,6 +177,11 @@ class Project(db.Model):
         """現在の実行予算額を設定"""
         self.current_budget_amount = value
 
+    @current_budget.expression
+    def current_budget(cls):
+        total_work_type_budget = cls.work_type_budget_total
+        return case((total_work_type_budget > 0, total_work_type_budget), else_=cls.budget_amount)
+
     @property
     def target_management_cost(self):
         """目標一般管理費を計算"""
@@ -181,56 +213,97 @@ class WorkType(db.Model):
     # 関連する支払い情報が削除されるように設定
     payments = db.relationship('Payment', backref='work_type', lazy=True, cascade='all, delete-orphan')
 
-    @property
+    def payment_totals(self):
+        """支払いの集計値（PaymentTotals）を読み込み済みの payments の1回の走査でまとめて求める
+
+        結果は工種が期限切れ（コミット・refresh など）になるまで保持する。
+        """
+        totals = self.__dict__.get('_payment_totals')
+        if totals is None:
+            total_payments = contract_total = non_contract_total = profit_amount = 0
+            for payment in self.payments:
+                if payment.is_profit:
+                    profit_amount += payment.amount
+                elif payment.payment_type != '出来高':
+                    total_payments += payment.amount
+                if payment.payment_type == '請負':
+                    contract_total += payment.amount
+                elif payment.payment_type == '請負外':
+                    non_contract_total += payment.amount
+            totals = PaymentTotals(total_payments, contract_total, non_contract_total, profit_amount)
+            self.__dict__['_payment_totals'] = totals
+        return totals
+
+    @classmethod
+    def _payment_sum(cls, *criteria):
+        """この工種の支払い金額の合計（SQL の相関サブクエリ）"""
+        return select(func.coalesce(func.sum(Payment.amount), 0))\
+            .where(Payment.work_type_id == cls.id, *criteria)\
+            .scalar_subquery()
+
+    @hybrid_property
     def total_payments(self):
         """支払い合計額を計算（利益計上と出来高を除く）"""
-        return sum(payment.amount for payment in self.payments 
-                  if not payment.is_profit and payment.payment_type != '出来高')
+        return self.payment_totals().total_payments
 
-    @property
+    @total_payments.expression
+    def total_payments(cls):
+        return cls._payment_sum(Payment.is_profit.isnot(True), Payment.payment_type != '出来高')
+
+    @hybrid_property
     def current_budget_amount(self):
         """実行予算額を計算（支払い額 + 残額合計 - 利益計上合計）"""
-        return self.total_payments + self.remaining_amount - self.profit_amount
+        totals = self.payment_totals()
+        return totals.total_payments + self.remaining_amount - totals.profit_amount
+
+    @current_budget_amount.expression
+    def current_budget_amount(cls):
+        return cls.total_payments + cls.remaining_amount - cls.profit_amount
 
     def calculate_remaining_amount(self):
         """予算残額を計算する。利益計上額を考慮"""
-        # 支払い合計（利益計上を除く）
-        total_payments = sum(payment.amount for payment in self.payments 
-                           if not payment.is_profit and payment.payment_type != '出来高')
-        self.remaining_amount = self.budget_amount - total_payments
+        # 変更直後の支払いで計算し直す
+        self.__dict__.pop('_payment_totals', None)
+        self.remaining_amount = self.budget_amount - self.payment_totals().total_payments
         return self.remaining_amount
 
-    @property
+    @hybrid_property
     def contract_total(self):
         """請負支払いの合計金額を計算"""
-        return sum(payment.amount for payment in self.payments if payment.payment_type == '請負')
+        return self.payment_totals().contract_total
 
-    @property
+    @contract_total.expression
+    def contract_total(cls):
+        return cls._payment_sum(Payment.payment_type == '請負')
+
+    @hybrid_property
     def non_contract_total(self):
         """請負外支払いの合計金額を計算"""
-        return sum(payment.amount for payment in self.payments if payment.payment_type == '請負外')
+        return self.payment_totals().non_contract_total
 
-    @property
+    @non_contract_total.expression
+    def non_contract_total(cls):
+        return cls._payment_sum(Payment.payment_type == '請負外')
+
+    @hybrid_property
     def profit_amount(self):
         """利益計上額の合計を計算"""
-        return sum(payment.amount for payment in self.payments if payment.is_profit)
+        return self.payment_totals().profit_amount
+
+    @profit_amount.expression
+    def profit_amount(cls):
+        return cls._payment_sum(Payment.is_profit.is_(True))
 
     def get_monthly_non_contract_totals(self):
-        """請負外支払いの月別合計を計算"""
+        """請負外支払いの月別合計を計算（整数の (年, 月) で集計・並べ替えし、表示用に「YYYY年M月」とする）"""
         monthly_totals = {}
         for payment in self.payments:
             if payment.payment_type == '請負外' and payment.year > 0:  # 未定の支払いは除外
-                key = f"{payment.year}年{payment.month}月"
-                if key not in monthly_totals:
-                    monthly_totals[key] = 0
-                monthly_totals[key] += payment.amount
+                key = (payment.year, payment.month)
+                monthly_totals[key] = monthly_totals.get(key, 0) + payment.amount
         
         # 日付順にソート
-        sorted_totals = sorted(
-            monthly_totals.items(),
-            key=lambda x: (int(x[0].split('年')[0]), int(x[0].split('年')[1].split('月')[0]))
-        )
-        return sorted_totals
+        return [(f"{year}年{month}月", amount) for (year, month), amount in sorted(monthly_totals.items())]
 
     @property
     def has_profit_entry(self):
@@ -258,6 +331,59 @@ class Payment(db.Model):
     contract_id = db.Column(db.Integer, db.ForeignKey('payments.id'))
     is_profit = db.Column(db.Boolean, default=False)  # 利益計上フラグを追加
 
+    # 既存のデータベースには flask create-indexes で追加する（db.create_all は既存のテーブルを飛ばすため）
+    __table_args__ = (
+        # 利益計上の有無の確認用（利益計上の行だけを持つ部分インデックス。MySQL では通常のインデックス）
+        db.Index('ix_payments_profit_work_type_id', work_type_id,
+                 postgresql_where=is_profit.is_(True), sqlite_where=is_profit.is_(True)),
+        # 請負契約ごとの出来高払いを支払年月順に読むため
+        db.Index('ix_payments_contract_id_year_month', contract_id, year, month),
+    )
+
+# WorkType.payment_totals が保持する支払い集計値は、工種の期限切れ・再読み込み、支払いの追加・削除、
+# 集計に使う支払いの項目の変更のたびに捨てる（同じセッション内のコミット前の変更も反映する）
+@event.listens_for(WorkType, 'expire')
+@event.listens_for(WorkType, 'refresh')
+def discard_payment_totals(work_type, *args):
+    """工種が期限切れ・再読み込みになったら保持している支払い集計値を捨てる"""
+    if work_type is not None:  # 参照がなくなった工種では None になる
+        work_type.__dict__.pop('_payment_totals', None)
+
+@event.listens_for(WorkType.payments, 'append')
+@event.listens_for(WorkType.payments, 'remove')
+def payments_changed(work_type, payment, initiator):
+    discard_payment_totals(work_type)
+
+def discard_payment_totals_of(payment, *work_type_ids):
+    """支払いの工種のうちセッションに読み込み済みのものから支払い集計値を捨てる"""
+    work_types = [payment.__dict__.get('work_type')]
+    session = object_session(payment)
+    if session is not None:
+        work_types.extend(
+            session.identity_map.get(identity_key(WorkType, work_type_id))
+            for work_type_id in work_type_ids
+            if isinstance(work_type_id, int)
+        )
+    for work_type in work_types:
+        discard_payment_totals(work_type)
+
+@event.listens_for(Payment.amount, 'set')
+@event.listens_for(Payment.payment_type, 'set')
+@event.listens_for(Payment.is_profit, 'set')
+def payment_figure_changed(payment, value, oldvalue, initiator):
+    discard_payment_totals_of(payment, payment.__dict__.get('work_type_id'))
+
+@event.listens_for(Payment.work_type_id, 'set')
+def payment_work_type_changed(payment, value, oldvalue, initiator):
+    # 移動元・移動先の両方の工種
+    discard_payment_totals_of(payment, value, oldvalue)
+
+@event.listens_for(Payment, 'after_insert')
+@event.listens_for(Payment, 'after_update')
+@event.listens_for(Payment, 'after_delete')
+def payment_flushed(mapper, connection, payment):
+    discard_payment_totals_of(payment, payment.work_type_id)
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     
@@ -274,39 +400,161 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+class CachedUser(UserMixin):
+    """セッションから切り離した軽量なユーザー情報（current_user として使う）"""
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.is_admin = bool(user.is_admin)
+
+class UserCache:
+    """ユーザーIDをキーにした CachedUser のTTL付きLRUキャッシュ（ワーカーごと）"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= monotonic():
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def set(self, user_id, user):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (monotonic() + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+# ログインユーザーのキャッシュ（有効期限は秒、0で無効）
+user_cache = UserCache(
+    maxsize=int(os.getenv('USER_CACHE_SIZE', 1024)),
+    ttl=int(os.getenv('USER_CACHE_TTL', 60))
+)
+
 @login_manager.user_loader
 def load_user(id):
-    return User.query.get(int(id))
+    # 通常はキャッシュから返し、認証済みリクエストごとの users テーブルへの問い合わせを省く
+    user_id = int(id)
+    cached = user_cache.get(user_id)
+    if cached is None:
+        user = User.query.get(user_id)
+        if user is None:
+            return None
+        cached = CachedUser(user)
+        user_cache.set(user_id, cached)
+    return cached
+
+def read_only(view):
+    """ビューを読み取り専用トランザクションで実行する（PostgreSQL では READ ONLY、終了時は常にロールバック）"""
+    @wraps(view)
+    def decorated_view(*args, **kwargs):
+        # ユーザー読み込みなどで始まったトランザクションを終えてから始め直す
+        db.session.rollback()
+        if db.engine.dialect.name == 'postgresql':
+            db.session.connection(execution_options={'postgresql_readonly': True})
+        try:
+            return view(*args, **kwargs)
+        finally:
+            db.session.rollback()
+    return decorated_view
+
+def project_summary_query():
+    """物件ごとの集計値（工種予算合計・支払済額・予算残額・利益額・利益率・予算増減額）を求めるクエリ
+
+    支払いを工種ごとに集計したサブクエリを工種に結合し、物件単位で GROUP BY する1回のSQLで求める。
+    工種と支払いを直接結合すると工種予算額が支払い件数分重複するため、支払いは先に工種ごとに集計する。
+    """
+    paid_by_work_type = db.session.query(
+        Payment.work_type_id,
+        func.sum(Payment.amount).label('paid')
+    ).group_by(Payment.work_type_id).subquery()
+
+    work_type_budget = func.coalesce(func.sum(WorkType.budget_amount), 0)
+    total_payments = func.coalesce(func.sum(paid_by_work_type.c.paid), 0)
+    # 工種がある場合は工種合計、ない場合は当初予算（Project.current_budget と同じ）
+    current_budget = case((work_type_budget > 0, work_type_budget), else_=Project.budget_amount)
+    profit = Project.contract_amount - total_payments
+
+    columns = {
+        'current_budget': current_budget,
+        'total_payments': total_payments,
+        'remaining_budget': current_budget - total_payments,
+        'profit': profit,
+        'profit_rate': case(
+            (Project.contract_amount > 0, profit * 100.0 / Project.contract_amount),
+            else_=0.0
+        ),
+        # 当初予算 - 工種予算合計（Project.budget_difference と同じ）
+        'budget_diff': case((work_type_budget > 0, Project.budget_amount - work_type_budget), else_=0),
+    }
+    query = db.session.query(Project, *(column.label(name) for name, column in columns.items()))\
+        .outerjoin(WorkType, WorkType.project_id == Project.id)\
+        .outerjoin(paid_by_work_type, paid_by_work_type.c.work_type_id == WorkType.id)\
+        .group_by(Project.id)
+    return query, columns
+
+# 物件一覧の並べ替えキー（集計値以外）
+PROJECT_SORT_COLUMNS = {
+    'created_at': Project.created_at,
+    'project_code': Project.project_code,
+    'project_name': Project.project_name,
+    'contract_amount': Project.contract_amount,
+    'budget_amount': Project.budget_amount,
+}
+
+def profit_work_type_ids_query(work_type_ids):
+    """指定の工種のうち利益計上がある工種IDのクエリ（部分インデックス ix_payments_profit_work_type_id を使う）"""
+    return db.session.query(Payment.work_type_id).filter(
+        Payment.work_type_id.in_(work_type_ids),
+        Payment.is_profit.is_(True)
+    ).group_by(Payment.work_type_id)
+
+def progress_payments_query(contract_ids):
+    """指定の請負契約の出来高払いを契約ID・支払年月順に返すクエリ（ix_payments_contract_id_year_month を使う）
+
+    請負契約と同じ業者・同じ工種の出来高払いだけを対象にする。
+    """
+    contract = aliased(Payment)
+    return Payment.query.join(contract, Payment.contract_id == contract.id).filter(
+        Payment.contract_id.in_(contract_ids),
+        Payment.payment_type == '出来高',
+        Payment.contractor == contract.contractor,
+        Payment.work_type_id == contract.work_type_id
+    ).order_by(Payment.contract_id, Payment.year, Payment.month, Payment.id)
 
 @app.route('/')
 def index():
     if current_user.is_authenticated:
-        projects = Project.query.order_by(Project.created_at.desc()).all()
-        
-        # 各プロジェクトの予算関連情報を計算
-        for project in projects:
-            # 全工種の支払い合計を計算（支払済額）
-            total_payments = sum(
-                sum(payment.amount for payment in work_type.payments)
-                for work_type in project.work_types
-            )
-            
-            # 予算残額を計算
-            project.remaining_budget = project.current_budget - total_payments
-            
-            # 利益額を計算（請負金額 - 予算額）
-            project.profit = project.contract_amount - total_payments
-            
-            # 利益率を計算（利益額 ÷ 請負金額 × 100）
-            if project.contract_amount > 0:
-                project.profit_rate = (project.profit / project.contract_amount) * 100
-            else:
-                project.profit_rate = 0
-            
-            # プロパティを使用して値を取得（代入はしない）
-            project.budget_diff = project.budget_difference
-        
-        return render_template('index.html', projects=projects)
+        query, columns = project_summary_query()
+
+        # 並べ替え（既定は登録日の新しい順）
+        sort = request.args.get('sort', 'created_at')
+        sort_column = PROJECT_SORT_COLUMNS.get(sort, columns.get(sort))
+        if sort_column is None:
+            sort, sort_column = 'created_at', Project.created_at
+        order = 'asc' if request.args.get('order') == 'asc' else 'desc'
+        sort_column = sort_column.asc() if order == 'asc' else sort_column.desc()
+
+        projects = query.order_by(sort_column, Project.id.desc()).paginate(
+            page=request.args.get('page', 1, type=int),
+            per_page=app.config['PROJECTS_PER_PAGE'],
+            error_out=False
+        )
+        return render_template('index.html', projects=projects, sort=sort, order=order)
     return render_template('index.html')
 
 @app.route('/add', methods=['GET', 'POST'])
@@ -353,6 +601,7 @@ def edit_project(id):
 
 @app.route('/projects/<int:project_id>/work_types')
 @login_required
+@read_only
 def work_type_list(project_id):
     project = Project.query.get_or_404(project_id)
     
@@ -373,8 +622,10 @@ def work_type_list(project_id):
     search_code = request.args.get('search_code', '')
     search_contractor = request.args.get('search_contractor', '')
     
-    # 工種を取得（コード順にソート）
-    work_types = WorkType.query.filter_by(project_id=project_id).order_by(WorkType.work_code).all()
+    # 工種を取得（コード順にソート）。支払いは工種ごとに遅延読み込みせず1回のクエリでまとめて読み込む
+    work_types = WorkType.query.filter_by(project_id=project_id)\
+        .options(selectinload(WorkType.payments))\
+        .order_by(WorkType.work_code).all()
     
     # 業者一覧を取得（重複を除く）
     contractors = db.session.query(Payment.contractor).distinct().join(WorkType).filter(
@@ -400,11 +651,24 @@ def work_type_list(project_id):
             filtered_work_types.append(work_type)
             work_type.filtered_payments = work_type.payments
     
-    # 各工種の残額を計算
-    for work_type in filtered_work_types:
-        work_type.remaining_amount = work_type.calculate_remaining_amount()
-        db.session.add(work_type)
-    db.session.commit()
+    # 利益計上がある工種を1回のクエリでまとめて求める（工種ごとの has_profit_entry の問い合わせを省く）
+    profit_work_type_ids = {
+        work_type_id for work_type_id, in profit_work_type_ids_query(
+            [work_type.id for work_type in filtered_work_types]
+        )
+    }
+    
+    # 表示する請負契約ごとの出来高払いを1回のクエリで支払年月順に読み、契約IDで引けるようにする
+    contract_ids = [
+        payment.id
+        for work_type in filtered_work_types
+        for payment in work_type.filtered_payments
+        if payment.payment_type == '請負'
+    ]
+    progress_payments_by_contract = {}
+    if contract_ids:
+        for payment in progress_payments_query(contract_ids):
+            progress_payments_by_contract.setdefault(payment.contract_id, []).append(payment)
     
     # 全体の支払い合計と残額を計算
     total_payment = sum(
@@ -416,6 +680,8 @@ def work_type_list(project_id):
     return render_template('work_type_list.html', 
                          project=project, 
                          work_types=filtered_work_types,
+                         profit_work_type_ids=profit_work_type_ids,
+                         progress_payments_by_contract=progress_payments_by_contract,
                          total_payment=total_payment,
                          remaining_budget=remaining_budget,
                          work_type_codes=WORK_TYPE_CODES,
@@ -532,8 +798,9 @@ def edit_work_type(id):
     if request.method == 'POST':
         work_type.work_code = request.form['work_code']
         work_type.work_name = request.form['work_name']
-        work_type.budget_amount = request.form['budget_amount']
-        work_type.remaining_amount = request.form['remaining_amount']
+        work_type.budget_amount = int(request.form['budget_amount'])
+        # 残額は予算額と支払いから求める（フォームの残額は予算変更前の値のため使わない）
+        work_type.calculate_remaining_amount()
         
         db.session.commit()
         flash('工種が正常に更新されました。')
@@ -703,8 +970,12 @@ def delete_work_type(id):
 @app.route('/delete_payment/<int:id>', methods=['POST'])
 def delete_payment(id):
     payment = Payment.query.get_or_404(id)
-    project_id = payment.work_type.project_id
+    work_type = payment.work_type
+    project_id = work_type.project_id
     db.session.delete(payment)
+    db.session.flush()
+    # 工種の残額を再計算
+    work_type.calculate_remaining_amount()
     db.session.commit()
     flash('支払い情報が削除されました')
     return redirect(url_for('work_type_list', project_id=project_id))
@@ -820,6 +1091,7 @@ def edit_user(id):
         if request.form.get('password'):
             user.set_password(request.form['password'])
         db.session.commit()
+        user_cache.invalidate(user.id)
         flash('ユーザー情報を更新しました')
         return redirect(url_for('user_list' if current_user.is_admin else 'index'))
     return render_template('edit_user.html', user=user)
@@ -838,6 +1110,7 @@ def delete_user(id):
     
     db.session.delete(user)
     db.session.commit()
+    user_cache.invalidate(user.id)
     flash('ユーザーを削除しました')
     return redirect(url_for('user_list'))
 
@@ -1005,6 +1278,45 @@ def reset_db():
     
     print('Database has been reset successfully.')
 
+@app.cli.command('recalculate-remaining')
+def recalculate_remaining():
+    """全工種の残額を支払いから再計算する（工種一覧の表示時に更新していた頃のデータの補正用）"""
+    # 支払い合計（利益計上と出来高を除く）。WorkType.calculate_remaining_amount と同じ条件
+    paid = db.session.query(func.coalesce(func.sum(Payment.amount), 0)).filter(
+        Payment.work_type_id == WorkType.id,
+        Payment.is_profit.isnot(True),
+        Payment.payment_type != '出来高'
+    ).scalar_subquery()
+    result = db.session.execute(
+        WorkType.__table__.update().values(remaining_amount=WorkType.budget_amount - paid)
+    )
+    db.session.commit()
+    print(f'{result.rowcount} 件の工種の残額を再計算しました')
+
+def create_missing_indexes(engine):
+    """モデルに定義したインデックスのうち、データベースにまだないものを作成し、作成したインデックス名を返す
+
+    db.create_all は既存のテーブルを飛ばすため、テーブル作成後に追加したインデックスはここで作成する。
+    作成済みのインデックスは飛ばすので、何度実行してもよい。
+    """
+    created = []
+    for table in (Project.__table__, WorkType.__table__, Payment.__table__):
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if inspect(engine).has_index(table.name, index.name):
+                continue
+            index.create(engine)
+            created.append(index.name)
+    return created
+
+@app.cli.command('create-indexes')
+def create_indexes():
+    """既存のデータベースに不足しているインデックスを作成する（デプロイのたびに実行してよい）"""
+    created = create_missing_indexes(db.engine)
+    for name in created:
+        print(f'インデックス {name} を作成しました')
+    if not created:
+        print('作成するインデックスはありません')
+
 @app.route('/init_db')
 def initialize_database():
     try:
@@ -1046,6 +1358,8 @@ def initialize_database():
 def toggle_profit(payment_id):
     payment = Payment.query.get_or_404(payment_id)
     payment.is_profit = not payment.is_profit
+    # 利益計上の支払いは残額の計算から除くため再計算する
+    payment.work_type.calculate_remaining_amount()
     db.session.commit()
     flash('利益計上状態を更新しました')
     return redirect(url_for('work_type_list', project_id=payment.work_type.project_id))
@@ -1076,6 +1390,7 @@ def delete_account():
         logout_user()
         db.session.delete(user)
         db.session.commit()
+        user_cache.invalidate(user.id)
         
         flash('アカウントを削除しました')
         return redirect(url_for('login'))
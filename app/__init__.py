@@ -1,12 +1,18 @@
-from flask import Flask, request, render_template, redirect, url_for, make_response, flash
+from flask import Flask, Response, request, render_template, redirect, url_for, make_response, flash, jsonify, get_template_attribute
 from flask_login import login_user, logout_user, login_required, current_user
 import os
+import hashlib
 import logging
+import click
 from dotenv import load_dotenv
+from markupsafe import Markup
 from datetime import datetime
-from sqlalchemy import inspect
+from functools import lru_cache
+from threading import Lock
+from time import monotonic
 
-from app.extensions import db, migrate, login_manager
+from app.extensions import db, migrate, login_manager, fragment_cache, password_hasher, user_cache, compressor
+from app.passwords import PasswordVerifierBusy
 
 # 環境変数の読み込み
 load_dotenv()
@@ -89,6 +95,154 @@ CONSTRUCTION_TYPES = {
     '61-30': '雑費（打ち合わせ・式典）'
 }
 
+def engine_options_from_env(database_url):
+    """環境変数から SQLALCHEMY_ENGINE_OPTIONS を組み立てる
+
+    DB_POOL_PRE_PING: 取り出し時に接続を確認する（既定: true）
+    DB_POOL_RECYCLE: 接続を作り直すまでの秒数（既定: 1800、-1で無効）
+    DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT: プールの常時接続数・追加接続数・待ち秒数
+    （SQLite はプールの種類が異なるため、サイズ関連は PostgreSQL 等のみに適用する）
+
+    プールは gunicorn のワーカーごとに作られるため、データベースへの接続数は最大で
+    ワーカー数（WEB_CONCURRENCY、既定は最大4） × (DB_POOL_SIZE + DB_MAX_OVERFLOW) になる。
+    データベースの接続数の上限（管理用の予約分を除く）を超えないように設定する。
+    """
+    options = {
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    if not database_url.startswith('sqlite'):
+        options.update(
+            pool_size=int(os.environ.get('DB_POOL_SIZE', 5)),
+            max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            pool_timeout=int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        )
+    return options
+
+def pool_status(pool):
+    """コネクションプールの使用状況（QueuePool 以外で取得できない値は None）"""
+    def call(name):
+        method = getattr(pool, name, None)
+        return method() if method is not None else None
+    overflow = call('overflow')
+    return {
+        'class': type(pool).__name__,
+        'size': call('size'),
+        'checked_in': call('checkedin'),
+        'checked_out': call('checkedout'),
+        # QueuePool はプールが埋まるまで負の値を返すため、size を超えて使用中の接続数にする
+        'overflow': max(overflow, 0) if overflow is not None else None
+    }
+
+def deploy_fingerprint():
+    """アプリのコード・テンプレートの内容のハッシュ（デプロイごとに変わり、ワーカー間では同じ値になる）"""
+    digest = hashlib.sha1()
+    root = os.path.dirname(os.path.abspath(__file__))
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames if name != '__pycache__')
+        for filename in sorted(filenames):
+            if filename.endswith(('.py', '.html')):
+                with open(os.path.join(directory, filename), 'rb') as f:
+                    digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def page_etag(salt, *parts):
+    """ページの強い ETag（salt とページの内容を決める値から作る）"""
+    return hashlib.sha1(repr((salt,) + parts).encode()).hexdigest()
+
+def not_modified(etag):
+    """本文なしの 304 応答"""
+    return set_page_etag(make_response('', 304), etag)
+
+def set_page_etag(response, etag):
+    """ETag を付け、ブラウザが毎回 If-None-Match で再検証するようにする"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def format_yen(value):
+    """金額を「1,000円」形式でフォーマットする（数値のみのためエスケープ不要）"""
+    return Markup(f'{value:,}円')
+
+def format_amount(value):
+    """表の金額を「1,000」形式でフォーマットする（0 は空欄）"""
+    return Markup(f'{value:,}') if value else ''
+
+def property_page_context(lazy=False):
+    """物件詳細ページの現在年月と表示モード（lazy: 支払い履歴を後から読み込む）"""
+    now = datetime.now()
+    return {
+        'current_year': now.year,
+        'current_month': now.month,
+        'lazy': lazy
+    }
+
+# 選択肢のHTMLはプロセスごとに一度だけ生成して使い回す
+@lru_cache(maxsize=None)
+def construction_type_options():
+    """工種コードの選択肢"""
+    return Markup('').join(
+        Markup('<option value="{0}" data-name="{1}">{0} - {1}</option>').format(code, name)
+        for code, name in CONSTRUCTION_TYPES.items()
+    )
+
+@lru_cache(maxsize=64)
+def year_options(current_year, selected=None):
+    """支払い年の選択肢（2020年から翌年まで）"""
+    return Markup('').join(
+        Markup('<option value="{0}"{1}>{0}年</option>').format(year, Markup(' selected') if year == selected else '')
+        for year in range(2020, current_year + 2)
+    )
+
+@lru_cache(maxsize=16)
+def month_options(selected=None):
+    """支払い月の選択肢"""
+    return Markup('').join(
+        Markup('<option value="{0}"{1}>{0}月</option>').format(month, Markup(' selected') if month == selected else '')
+        for month in range(1, 13)
+    )
+
+def budget_cache_marker(summary, ctx):
+    """工種カードの変更マーカー（工種・支払いの更新と年月の選択肢の変化を検出する）
+
+    支払いの変更時は集計列の更新と同時に工種の updated_at も更新される。
+    """
+    return (
+        summary.budget.updated_at,
+        ctx['current_year'],
+        ctx['current_month'],
+        ctx['lazy']
+    )
+
+def render_budget_cards(property_id, summaries, ctx):
+    """工種カードを描画する。変更のない工種はフラグメントキャッシュから返す"""
+    from app.summary import EMPTY_VENDOR_GROUPS, get_vendor_groups
+    
+    cards = {}
+    stale = []
+    for summary in summaries:
+        marker = budget_cache_marker(summary, ctx)
+        card = fragment_cache.get(summary.budget.id, marker)
+        if card is None:
+            stale.append((summary, marker))
+        else:
+            cards[summary.budget.id] = card
+    
+    # キャッシュにない工種の支払いだけを取得して描画する（遅延読み込み時は支払いを取得しない）
+    if stale:
+        if ctx['lazy']:
+            vendor_groups = {}
+        else:
+            budget_ids = None if len(stale) == len(summaries) else [summary.budget.id for summary, _ in stale]
+            vendor_groups = get_vendor_groups(property_id, budget_ids)
+        budget_card = get_template_attribute('_budget_macros.html', 'budget_card')
+        for summary, marker in stale:
+            card = budget_card(summary, vendor_groups.get(summary.budget.id, EMPTY_VENDOR_GROUPS), ctx)
+            fragment_cache.set(summary.budget.id, marker, card)
+            cards[summary.budget.id] = card
+    
+    return [cards[summary.budget.id] for summary in summaries]
+
 def create_app():
     app = Flask(__name__)
     
@@ -121,104 +275,86 @@ def create_app():
     
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options_from_env(database_url)
+    
+    # /healthz のデータベース疎通確認の結果を再利用する秒数
+    app.config['HEALTHZ_PING_TTL'] = float(os.environ.get('HEALTHZ_PING_TTL', 10))
     
     # セッション設定
     app.config['SESSION_COOKIE_SECURE'] = os.environ.get('PRODUCTION', 'false').lower() == 'true'
     app.config['SESSION_COOKIE_HTTPONLY'] = True
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
     
+    # ページの ETag に含める値（テンプレート・コードの変更後に古いページを 304 で返さないため、デプロイごとに変える）
+    app.config['ETAG_SALT'] = os.environ.get('ETAG_SALT') or os.environ.get('RENDER_GIT_COMMIT') or deploy_fingerprint()
+    
+    # テキストのレスポンスの圧縮（gzip、brotli がインストールされていれば brotli）と圧縮する最小バイト数
+    app.config['COMPRESS_ENABLED'] = os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true'
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    app.config['COMPRESS_GZIP_LEVEL'] = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+    app.config['COMPRESS_BROTLI_QUALITY'] = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+    
+    # 工種カードのフラグメントキャッシュ設定（0で無効）
+    app.config['FRAGMENT_CACHE_SIZE'] = int(os.environ.get('FRAGMENT_CACHE_SIZE', 512))
+    
+    # 物件詳細ページで支払い履歴を工種ごとに遅延読み込みするか（?lazy=1/0 で切り替え可）
+    app.config['PROPERTY_DETAIL_LAZY'] = os.environ.get('PROPERTY_DETAIL_LAZY', 'false').lower() == 'true'
+    app.config['PAYMENT_HISTORY_PAGE_SIZE'] = int(os.environ.get('PAYMENT_HISTORY_PAGE_SIZE', 20))
+    
+    # JSON API の支払い一覧の既定・最大件数
+    app.config['API_PAGE_SIZE'] = int(os.environ.get('API_PAGE_SIZE', 100))
+    app.config['API_MAX_PAGE_SIZE'] = int(os.environ.get('API_MAX_PAGE_SIZE', 1000))
+
+    # 支払いの一括取込（1回の挿入でまとめる行数とアップロードの上限バイト数）
+    app.config['PAYMENT_IMPORT_BATCH_SIZE'] = int(os.environ.get('PAYMENT_IMPORT_BATCH_SIZE', 1000))
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
+    
+    # ログインユーザーのキャッシュ設定（有効期限は秒、0で無効）
+    app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 60))
+    
+    # パスワードのハッシュ方式・コスト（werkzeug の method 形式、例: scrypt:32768:8:1, pbkdf2:sha256:600000）
+    # 変更後は各ユーザーの次回ログイン時に新しい設定で再ハッシュする
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    # プロセス内で同時に実行するパスワード検証の数（0で制限なし）と、空きを待つ秒数（超えるとログインは503）
+    app.config['PASSWORD_VERIFY_CONCURRENCY'] = int(os.environ.get('PASSWORD_VERIFY_CONCURRENCY', 2))
+    app.config['PASSWORD_VERIFY_WAIT'] = float(os.environ.get('PASSWORD_VERIFY_WAIT', 0.5))
+    
+    # カスタムフィルターを登録
+    app.jinja_env.filters['format_yen'] = format_yen
+    app.jinja_env.filters['format_amount'] = format_amount
+    app.jinja_env.globals.update(
+        construction_type_options=construction_type_options,
+        year_options=year_options,
+        month_options=month_options
+    )
+    
     # 拡張機能の初期化
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
+    fragment_cache.init_app(app)
+    user_cache.init_app(app)
+    password_hasher.init_app(app)
+    compressor.init_app(app)
     
     # モデルのインポート（循環インポートを避けるため、ここでインポート）
     from app.models import User, Property, ConstructionBudget, Payment
+    from app.summary import (
+        BudgetSummary, decode_cursor, get_budget_summaries, get_cash_flow, get_property_rollups,
+        get_vendor_histories, get_vendor_payment_page, payment_totals, rebuild_budget_totals,
+        update_budget_totals, vendor_totals, VendorHistory
+    )
+    from app.api import (
+        API_PREFIX, ApiError, api_login_required, budget_values, error_response, json_response, list_budgets,
+        list_payments, owned_budget, owned_payment, owned_property, payment_values, property_values, request_data,
+        serialize_budget, serialize_payment, serialize_property
+    )
+    from app.payment_export import EXPORT_TABLES, iter_csv, iter_xlsx
+    from app.payment_import import PaymentImportError, import_payments, read_rows
     
-    # データベースの初期化
-    try:
-        with app.app_context():
-            # テーブルの存在確認
-            inspector = inspect(db.engine)
-            existing_tables = inspector.get_table_names()
-            app.logger.info(f'既存のテーブル: {existing_tables}')
-            
-            # テーブルが存在しない場合は作成
-            required_tables = {'user', 'property', 'construction_budget', 'payment'}
-            missing_tables = required_tables - set(existing_tables)
-            
-            if missing_tables:
-                app.logger.info(f'作成が必要なテーブル: {missing_tables}')
-                db.create_all()
-                app.logger.info('データベーステーブルを作成しました')
-            
-            # テーブルのカラムを確認
-            for table_name in required_tables:
-                if table_name in existing_tables:
-                    columns = [column['name'] for column in inspector.get_columns(table_name)]
-                    app.logger.info(f'{table_name}テーブルのカラム: {columns}')
-            
-            # payment テーブルのカラム確認と追加
-            if 'payment' in existing_tables:
-                columns = {column['name'] for column in inspector.get_columns('payment')}
-                
-                # payment_type カラムの確認と追加
-                if 'payment_type' not in columns:
-                    app.logger.info('payment テーブルに payment_type カラムを追加します')
-                    with db.engine.connect() as conn:
-                        conn.execute(db.text('ALTER TABLE payment ADD COLUMN payment_type VARCHAR(50) NOT NULL DEFAULT \'請負\''))
-                        conn.commit()
-                    app.logger.info('payment_type カラムを追加しました')
-                
-                # budget_id カラムの確認と追加
-                if 'budget_id' not in columns:
-                    app.logger.info('payment テーブルに budget_id カラムを追加します')
-                    with db.engine.connect() as conn:
-                        conn.execute(db.text('ALTER TABLE payment ADD COLUMN budget_id INTEGER REFERENCES construction_budget(id)'))
-                        conn.commit()
-                    app.logger.info('budget_id カラムを追加しました')
-                
-                # is_contract カラムの確認と追加
-                if 'is_contract' not in columns:
-                    app.logger.info('payment テーブルに is_contract カラムを追加します')
-                    with db.engine.connect() as conn:
-                        conn.execute(db.text('ALTER TABLE payment ADD COLUMN is_contract BOOLEAN NOT NULL DEFAULT TRUE'))
-                        conn.commit()
-                    app.logger.info('is_contract カラムを追加しました')
-                
-                # note カラムの確認と追加
-                if 'note' not in columns:
-                    app.logger.info('payment テーブルに note カラムを追加します')
-                    with db.engine.connect() as conn:
-                        conn.execute(db.text('ALTER TABLE payment ADD COLUMN note TEXT'))
-                        conn.commit()
-                    app.logger.info('note カラムを追加しました')
-            
-            # 管理者ユーザーの作成（テーブル作成直後のみ）
-            if 'user' in missing_tables:
-                admin = User.query.filter_by(username='admin').first()
-                if not admin:
-                    admin = User(
-                        username='admin',
-                        email='admin@example.com',
-                        is_admin=True
-                    )
-                    admin.set_password('admin')
-                    db.session.add(admin)
-                    db.session.commit()
-                    app.logger.info('管理者ユーザーを作成しました')
-            
-            # データベース接続テスト
-            db.session.execute(db.text('SELECT 1'))
-            app.logger.info('データベース接続テスト成功')
-            
-    except Exception as e:
-        app.logger.error(f'データベース初期化エラー: {str(e)}')
-        app.logger.error(f'エラーの詳細: {e.__class__.__name__}')
-        app.logger.error(f'データベース接続URL: {database_url}')
-        if hasattr(e, 'orig'):
-            app.logger.error(f'原因: {str(e.orig)}')
-        raise
+    # スキーマの作成・変更は Alembic のマイグレーションで行う（flask --app app db upgrade）
+    # 起動時にはデータベースへ接続しない
     
     # ルートの定義
     @app.route('/')
@@ -246,6 +382,49 @@ def create_app():
         </html>
         '''
 
+    def login_page(error_message=''):
+        """ログイン画面のHTML"""
+        return f'''
+        <!DOCTYPE html>
+        <html lang="ja">
+        <head>
+            <meta charset="utf-8">
+            <title>ログイン - 予算管理システム</title>
+            <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
+        </head>
+        <body>
+            <div class="container mt-5">
+                <div class="row justify-content-center">
+                    <div class="col-md-6">
+                        <div class="card">
+                            <div class="card-header">
+                                <h4 class="mb-0">ログイン</h4>
+                            </div>
+                            <div class="card-body">
+                                {error_message}
+                                <form method="POST">
+                                    <div class="mb-3">
+                                        <label for="username" class="form-label">ユーザー名</label>
+                                        <input type="text" class="form-control" id="username" name="username" required>
+                                    </div>
+                                    <div class="mb-3">
+                                        <label for="password" class="form-label">パスワード</label>
+                                        <input type="password" class="form-control" id="password" name="password" required>
+                                    </div>
+                                    <div class="d-grid gap-2">
+                                        <button type="submit" class="btn btn-primary">ログイン</button>
+                                        <a href="/register" class="btn btn-secondary">新規登録</a>
+                                    </div>
+                                </form>
+                            </div>
+                        </div>
+                    </div>
+                </div>
+            </div>
+        </body>
+        </html>
+        '''
+
     @app.route('/login', methods=['GET', 'POST'])
     def login():
         if request.method == 'GET':
@@ -258,46 +437,7 @@ def create_app():
             elif error == 'system_error':
                 error_message = '<div class="alert alert-danger">ログイン処理中にエラーが発生しました。しばらく待ってから再度お試しください。</div>'
             
-            return f'''
-            <!DOCTYPE html>
-            <html lang="ja">
-            <head>
-                <meta charset="utf-8">
-                <title>ログイン - 予算管理システム</title>
-                <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-            </head>
-            <body>
-                <div class="container mt-5">
-                    <div class="row justify-content-center">
-                        <div class="col-md-6">
-                            <div class="card">
-                                <div class="card-header">
-                                    <h4 class="mb-0">ログイン</h4>
-                                </div>
-                                <div class="card-body">
-                                    {error_message}
-                                    <form method="POST">
-                                        <div class="mb-3">
-                                            <label for="username" class="form-label">ユーザー名</label>
-                                            <input type="text" class="form-control" id="username" name="username" required>
-                                        </div>
-                                        <div class="mb-3">
-                                            <label for="password" class="form-label">パスワード</label>
-                                            <input type="password" class="form-control" id="password" name="password" required>
-                                        </div>
-                                        <div class="d-grid gap-2">
-                                            <button type="submit" class="btn btn-primary">ログイン</button>
-                                            <a href="/register" class="btn btn-secondary">新規登録</a>
-                                        </div>
-                                    </form>
-                                </div>
-                            </div>
-                        </div>
-                    </div>
-                </div>
-            </body>
-            </html>
-            '''
+            return login_page(error_message)
         
         try:
             username = request.form.get('username')
@@ -308,10 +448,22 @@ def create_app():
                 return redirect('/login?error=missing_fields')
             
             user = User.query.filter_by(username=username).first()
-            if user is None or not user.check_password(password):
+            try:
+                valid = user is not None and user.check_password(password)
+            except PasswordVerifierBusy:
+                app.logger.warning(f'ログイン混雑: パスワード検証の待ちが上限に達しました（ユーザー名 "{username}"）')
+                busy_message = '<div class="alert alert-warning">ログインが混み合っています。しばらく待ってから再度お試しください。</div>'
+                return login_page(busy_message), 503, {'Retry-After': '1'}
+            if not valid:
                 app.logger.warning(f'ログイン失敗: ユーザー名またはパスワードが正しくありません')
                 return redirect('/login?error=invalid_credentials')
             
+            # ハッシュ方式・コストの設定が変わっていれば新しい設定で保存し直す
+            if user.password_needs_rehash():
+                user.set_password(password)
+                db.session.commit()
+                app.logger.info(f'パスワードを再ハッシュしました: ユーザー "{username}"')
+            
             login_user(user)
             app.logger.info(f'ログイン成功: ユーザー "{username}"')
             return redirect('/budgets')
@@ -333,17 +485,32 @@ def create_app():
         try:
             app.logger.info('予算ページへのアクセス')
             app.logger.info(f'ユーザーID: {current_user.id}')
-            properties = Property.query.filter_by(user_id=current_user.id).all()
+            
+            # 物件の追加・削除・版数の変化がなければ、工種・支払いを集計せずに 304 を返す
+            versions = db.session.query(Property.id, Property.version, Property.updated_at).filter_by(
+                user_id=current_user.id
+            ).order_by(Property.id).all()
+            etag = page_etag(app.config['ETAG_SALT'], current_user.id, [tuple(row) for row in versions])
+            if request.if_none_match.contains_weak(etag):
+                return not_modified(etag)
+            
+            # 物件ごとの工種予算・支払合計（物件数によらず1クエリ）
+            rollups = get_property_rollups(current_user.id)
             
             # 物件リストのHTMLを生成
             properties_html = ''
-            for property in properties:
+            for rollup in rollups:
+                property = rollup.property
+                overrun_badge = ' <span class="badge bg-danger">超過</span>' if rollup.is_overrun else ''
                 properties_html += f'''
-                <tr>
+                <tr{' class="table-danger"' if rollup.is_overrun else ''}>
                     <td>{property.code}</td>
                     <td>{property.name}</td>
                     <td>{property.contract_amount:,}円</td>
                     <td>{property.budget_amount:,}円</td>
+                    <td>{rollup.budget_total:,}円</td>
+                    <td>{rollup.paid_total:,}円</td>
+                    <td>{rollup.remaining:,}円{overrun_badge}</td>
                     <td>
                         <div class="btn-group" role="group">
                             <a href="/property/{property.id}" class="btn btn-sm btn-info">詳細</a>
@@ -415,7 +582,7 @@ def create_app():
                 </tr>
                 '''
             
-            return f'''
+            response = make_response(f'''
             <!DOCTYPE html>
             <html lang="ja">
             <head>
@@ -453,6 +620,9 @@ def create_app():
                                     <th>物件名</th>
                                     <th>契約金額</th>
                                     <th>予算金額</th>
+                                    <th>工種予算合計</th>
+                                    <th>支払済</th>
+                                    <th>残額</th>
                                     <th>操作</th>
                                 </tr>
                             </thead>
@@ -501,7 +671,8 @@ def create_app():
                 <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
             </body>
             </html>
-            '''
+            ''')
+            return set_page_etag(response, etag)
         except Exception as e:
             app.logger.error(f'予算ページ処理エラー: {str(e)}')
             app.logger.error(f'エラーの詳細: {e.__class__.__name__}')
@@ -641,630 +812,93 @@ def create_app():
                 app.logger.warning(f'権限エラー: ユーザーID {current_user.id} は物件ID {property_id} にアクセスできません')
                 return redirect('/budgets')
             
-            # 工種一覧の取得
+            lazy = request.args.get('lazy', '1' if app.config['PROPERTY_DETAIL_LAZY'] else '0') == '1'
+            ctx = property_page_context(lazy)
+            
+            # 物件の版数が変わっていなければ、工種・支払いを取得せずに 304 を返す
+            etag = page_etag(
+                app.config['ETAG_SALT'], current_user.id, property.id, property.version,
+                ctx['current_year'], ctx['current_month'], lazy
+            )
+            if request.if_none_match.contains_weak(etag):
+                return not_modified(etag)
+            
+            # 工種一覧と支払集計の取得（工種数によらず一定のクエリ数）
             try:
-                budgets = ConstructionBudget.query.filter_by(property_id=property_id).all()
-                app.logger.info(f'工種一覧を取得: {len(budgets)}件')
+                summaries = get_budget_summaries(property_id)
+                app.logger.info(f'工種一覧を取得: {len(summaries)}件')
             except Exception as e:
                 app.logger.error(f'工種一覧の取得に失敗: {str(e)}')
                 raise
             
-            # 工種リストのHTML生成
-            budgets_html = ''
-            total_amount = 0
-            for budget in budgets:
-                total_amount += budget.amount
-                
-                # 支払い情報の取得と集計
-                payments = Payment.query.filter_by(construction_budget_id=budget.id).all()
-                contract_payments = [p for p in payments if p.is_contract and p.note != "出来高支払"]
-                progress_payments = [p for p in payments if p.is_contract and p.note == "出来高支払"]
-                non_contract_payments = [p for p in payments if not p.is_contract]
-                
-                # 請負支払いの合計（出来高支払いを含む）
-                contract_total = sum(p.amount for p in contract_payments)
-                # 出来高支払いの合計
-                progress_total = sum(p.amount for p in progress_payments)
-                # 請負外支払いの合計
-                non_contract_total = sum(p.amount for p in non_contract_payments)
-                # 総支払額
-                total_paid = contract_total + progress_total + non_contract_total
-                # 請負残額（予算額から出来高支払い合計を引いた額）
-                contract_remaining = budget.amount - progress_total
-
-                # HTML変数の初期化
-                contract_payments_html = ''
-                progress_payments_html = ''
-                non_contract_payments_html = ''
-
-                # 年月の選択肢を生成（条件分岐の前に移動）
-                current_year = datetime.now().year
-                current_month = datetime.now().month
-                year_options = [f'<option value="{year}" {"selected" if year == current_year else ""}>{year}年</option>' for year in range(2020, current_year + 2)]
-                month_options = [f'<option value="{month}" {"selected" if month == current_month else ""}>{month}月</option>' for month in range(1, 13)]
-
-                # 請負支払いの処理
-                if contract_payments:
-                    # 業者ごとにグループ化
-                    vendor_groups = {}
-                    for payment in contract_payments:
-                        if payment.vendor_name not in vendor_groups:
-                            vendor_groups[payment.vendor_name] = []
-                        vendor_groups[payment.vendor_name].append(payment)
-                    
-                    # 業者ごとのHTML生成
-                    vendor_cards = []
-                    
-                    for vendor_name, vendor_payments in vendor_groups.items():
-                        # 業者ごとの支払い合計と残額を計算
-                        vendor_total = sum(p.amount for p in vendor_payments)
-                        vendor_remaining = vendor_total - progress_total  # 請負額から出来高支払い合計を引いた額
-                        remaining_style = 'color: red;' if vendor_remaining < 0 else ''
-                        warning_message = '<div class="text-danger">※請負額を超過しています</div>' if vendor_remaining < 0 else ''
-                        
-                        # 支払い履歴の行を生成
-                        payment_rows = []
-                        for p in sorted(vendor_payments, key=lambda x: (x.year, x.month)):
-                            payment_rows.append(
-                                f'''<tr>
-                                    <td>{p.year}年{p.month}月</td>
-                                    <td>{p.amount:,}円</td>
-                                    <td>{p.note or ""}</td>
-                                    <td>
-                                        <div class="btn-group" role="group">
-                                            <button type="button" class="btn btn-sm btn-warning" data-bs-toggle="modal" data-bs-target="#editPaymentModal{p.id}">編集</button>
-                                            <button type="button" class="btn btn-sm btn-danger" data-bs-toggle="modal" data-bs-target="#deletePaymentModal{p.id}">削除</button>
-                                        </div>
-                                    </td>
-                                </tr>'''
-                            )
-
-                            # 支払い編集モーダル
-                            payment_rows.append(f'''
-                            <div class="modal fade" id="editPaymentModal{p.id}" tabindex="-1">
-                                <div class="modal-dialog">
-                                    <div class="modal-content">
-                                        <div class="modal-header">
-                                            <h5 class="modal-title">支払い編集</h5>
-                                            <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
-                                        </div>
-                                        <div class="modal-body">
-                                            <form action="/payment/{p.id}/edit" method="POST">
-                                                <div class="row mb-3">
-                                                    <div class="col">
-                                                        <label for="payment_year" class="form-label">年</label>
-                                                        <select class="form-select" id="payment_year" name="payment_year" required>
-                                                            {''.join([f'<option value="{year}" {"selected" if year == p.year else ""}>{year}年</option>' for year in range(2020, datetime.now().year + 2)])}
-                                                        </select>
-                                                    </div>
-                                                    <div class="col">
-                                                        <label for="payment_month" class="form-label">月</label>
-                                                        <select class="form-select" id="payment_month" name="payment_month" required>
-                                                            {''.join([f'<option value="{month}" {"selected" if month == p.month else ""}>{month}月</option>' for month in range(1, 13)])}
-                                                        </select>
-                                                    </div>
-                                                </div>
-                                                <div class="mb-3">
-                                                    <label for="payment_amount" class="form-label">支払い金額</label>
-                                                    <input type="number" class="form-control" id="payment_amount" name="payment_amount" value="{p.amount}" required>
-                                                </div>
-                                                <div class="mb-3">
-                                                    <label for="payment_note" class="form-label">備考</label>
-                                                    <textarea class="form-control" id="payment_note" name="payment_note" rows="3">{p.note or ""}</textarea>
-                                                </div>
-                                                <div class="text-end">
-                                                    <button type="submit" class="btn btn-primary">更新</button>
-                                                </div>
-                                            </form>
-                                        </div>
-                                    </div>
-                                </div>
-                            </div>
-
-                            <!-- 支払い削除確認モーダル -->
-                            <div class="modal fade" id="deletePaymentModal{p.id}" tabindex="-1">
-                                <div class="modal-dialog">
-                                    <div class="modal-content">
-                                        <div class="modal-header">
-                                            <h5 class="modal-title">支払い削除の確認</h5>
-                                            <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
-                                        </div>
-                                        <div class="modal-body">
-                                            <p>{p.year}年{p.month}月の支払い（{p.amount:,}円）を削除してもよろしいですか？</p>
-                                            <p class="text-danger">この操作は取り消せません。</p>
-                                        </div>
-                                        <div class="modal-footer">
-                                            <form action="/payment/{p.id}/delete" method="POST">
-                                                <button type="button" class="btn btn-secondary" data-bs-dismiss="modal">キャンセル</button>
-                                                <button type="submit" class="btn btn-danger">削除</button>
-                                            </form>
-                                        </div>
-                                    </div>
-                                </div>
-                            </div>
-                            ''')
-                        
-                        # 業者カードを生成
-                        vendor_card = f'''
-                        <div class="card mb-3">
-                            <div class="card-header d-flex justify-content-between align-items-center">
-                                <div>
-                                    <span class="fw-bold">{vendor_name}</span>
-                                    <span class="ms-3 text-muted">請負額: {vendor_total:,}円</span>
-                                </div>
-                                <div class="btn-group" role="group">
-                                    <button type="button" class="btn btn-sm btn-success" data-bs-toggle="modal" data-bs-target="#progressPaymentModal{budget.id}_{vendor_name.replace(" ", "_")}">出来高払い</button>
-                                    <button type="button" class="btn btn-sm btn-warning" data-bs-toggle="modal" data-bs-target="#editVendorModal{budget.id}_{vendor_name.replace(" ", "_")}">編集</button>
-                                    <button type="button" class="btn btn-sm btn-danger" data-bs-toggle="modal" data-bs-target="#deleteVendorModal{budget.id}_{vendor_name.replace(" ", "_")}">削除</button>
-                                </div>
-                            </div>
-                            <div class="card-body p-0">
-                                <table class="table table-sm mb-0">
-                                    <thead>
-                                        <tr>
-                                            <th>登録年月</th>
-                                            <th>出来高支払額</th>
-                                            <th>備考</th>
-                                            <th>操作</th>
-                                        </tr>
-                                    </thead>
-                                    <tbody>
-                                        {''.join(payment_rows)}
-                                        <tr class="table-info">
-                                            <td class="text-end">支払残額</td>
-                                            <td style="{remaining_style}">{vendor_remaining:,}円</td>
-                                            <td colspan="2">{warning_message}</td>
-                                        </tr>
-                                    </tbody>
-                                </table>
-                            </div>
-                        </div>
-
-                        <!-- 出来高支払いモーダル -->
-                        <div class="modal fade" id="progressPaymentModal{budget.id}_{vendor_name.replace(" ", "_")}" tabindex="-1">
-                            <div class="modal-dialog">
-                                <div class="modal-content">
-                                    <div class="modal-header">
-                                        <h5 class="modal-title">出来高支払い入力</h5>
-                                        <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
-                                    </div>
-                                    <div class="modal-body">
-                                        <form action="/budget/{budget.id}/payment/add" method="POST">
-                                            <div class="row mb-3">
-                                                <div class="col">
-                                                    <label for="payment_year" class="form-label">年</label>
-                                                    <select class="form-select" id="payment_year" name="payment_year" required>
-                                                        {''.join(year_options)}
-                                                    </select>
-                                                </div>
-                                                <div class="col">
-                                                    <label for="payment_month" class="form-label">月</label>
-                                                    <select class="form-select" id="payment_month" name="payment_month" required>
-                                                        {''.join(month_options)}
-                                                    </select>
-                                                </div>
-                                            </div>
-                                            <div class="mb-3">
-                                                <label for="payment_amount" class="form-label">出来高支払額</label>
-                                                <input type="number" class="form-control" id="payment_amount" name="payment_amount" required>
-                                            </div>
-                                            <div class="mb-3">
-                                                <label for="payment_note" class="form-label">備考</label>
-                                                <textarea class="form-control" id="payment_note" name="payment_note" rows="3"></textarea>
-                                            </div>
-                                            <input type="hidden" name="vendor_name" value="{vendor_name}">
-                                            <input type="hidden" name="is_contract" value="true">
-                                            <input type="hidden" name="note" value="出来高支払">
-                                            <div class="text-end">
-                                                <button type="submit" class="btn btn-primary">登録</button>
-                                            </div>
-                                        </form>
-                                    </div>
-                                </div>
-                            </div>
-                        </div>
-
-                        <!-- 業者編集モーダル -->
-                        <div class="modal fade" id="editVendorModal{budget.id}_{vendor_name.replace(" ", "_")}" tabindex="-1">
-                            <div class="modal-dialog">
-                                <div class="modal-content">
-                                    <div class="modal-header">
-                                        <h5 class="modal-title">業者情報編集</h5>
-                                        <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
-                                    </div>
-                                    <div class="modal-body">
-                                        <form action="/budget/{budget.id}/vendor/edit" method="POST">
-                                            <div class="mb-3">
-                                                <label for="vendor_name" class="form-label">業者名</label>
-                                                <input type="text" class="form-control" id="vendor_name" name="vendor_name" value="{vendor_name}" required>
-                                            </div>
-                                            <div class="mb-3">
-                                                <label for="contract_amount" class="form-label">請負額</label>
-                                                <input type="number" class="form-control" id="contract_amount" name="contract_amount" value="{vendor_total}" required>
-                                            </div>
-                                            <input type="hidden" name="old_vendor_name" value="{vendor_name}">
-                                            <div class="text-end">
-                                                <button type="submit" class="btn btn-primary">更新</button>
-                                            </div>
-                                        </form>
-                                    </div>
-                                </div>
-                            </div>
-                        </div>
-
-                        <!-- 業者削除確認モーダル -->
-                        <div class="modal fade" id="deleteVendorModal{budget.id}_{vendor_name.replace(" ", "_")}" tabindex="-1">
-                            <div class="modal-dialog">
-                                <div class="modal-content">
-                                    <div class="modal-header">
-                                        <h5 class="modal-title">業者削除の確認</h5>
-                                        <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
-                                    </div>
-                                    <div class="modal-body">
-                                        <p>業者「{vendor_name}」の支払い情報を削除してもよろしいですか？</p>
-                                        <p class="text-danger">この操作は取り消せません。</p>
-                                    </div>
-                                    <div class="modal-footer">
-                                        <form action="/budget/{budget.id}/vendor/delete" method="POST">
-                                            <input type="hidden" name="vendor_name" value="{vendor_name}">
-                                            <button type="button" class="btn btn-secondary" data-bs-dismiss="modal">キャンセル</button>
-                                            <button type="submit" class="btn btn-danger">削除</button>
-                                        </form>
-                                    </div>
-                                </div>
-                            </div>
-                        </div>'''
-                    
-                    # 全体のHTML生成
-                    contract_payments_html = f'''
-                    <div class="col-md-6">
-                        <h6 class="mb-2">請負支払</h6>
-                        {''.join(vendor_cards)}
-                        <div class="card mb-3">
-                            <div class="card-body">
-                                <div class="row">
-                                    <div class="col">
-                                        <div>請負支払合計: {contract_total:,}円</div>
-                                    </div>
-                                </div>
-                            </div>
-                        </div>
-                    </div>'''
-
-                # 出来高支払いの処理
-                if progress_payments:
-                    # 業者ごとにグループ化
-                    progress_vendor_groups = {}
-                    for payment in progress_payments:
-                        if payment.vendor_name not in progress_vendor_groups:
-                            progress_vendor_groups[payment.vendor_name] = []
-                        progress_vendor_groups[payment.vendor_name].append(payment)
-                    
-                    # 業者ごとのHTML生成
-                    progress_vendor_cards = []
-                    for vendor_name, vendor_payments in progress_vendor_groups.items():
-                        # 支払い履歴の行を生成
-                        payment_rows = []
-                        for p in sorted(vendor_payments, key=lambda x: (x.year, x.month)):
-                            payment_rows.append(
-                                f'''<tr>
-                                    <td>{p.year}年{p.month}月</td>
-                                    <td>{p.amount:,}円</td>
-                                    <td>{p.note or ""}</td>
-                                    <td>
-                                        <div class="btn-group" role="group">
-                                            <button type="button" class="btn btn-sm btn-warning" data-bs-toggle="modal" data-bs-target="#editPaymentModal{p.id}">編集</button>
-                                            <button type="button" class="btn btn-sm btn-danger" data-bs-toggle="modal" data-bs-target="#deletePaymentModal{p.id}">削除</button>
-                                        </div>
-                                    </td>
-                                </tr>'''
-                            )
-                        
-                        # 業者カードを生成
-                        vendor_card = f'''
-                        <div class="card mb-3">
-                            <div class="card-header">
-                                <span class="fw-bold">{vendor_name}</span>
-                            </div>
-                            <div class="card-body p-0">
-                                <table class="table table-sm mb-0">
-                                    <thead><tr><th>年月</th><th>金額</th><th>備考</th><th>操作</th></tr></thead>
-                                    <tbody>
-                                        {''.join(payment_rows)}
-                                        <tr class="table-info">
-                                            <td class="text-end">出来高支払合計</td>
-                                            <td>{sum(p.amount for p in vendor_payments):,}円</td>
-                                            <td colspan="2"></td>
-                                        </tr>
-                                    </tbody>
-                                </table>
-                            </div>
-                        </div>'''
-                        progress_vendor_cards.append(vendor_card)
-                    
-                    # 出来高支払い全体のHTML生成
-                    progress_payments_html = f'''
-                    <div class="col-md-6">
-                        <h6 class="mb-2">出来高支払</h6>
-                        {''.join(progress_vendor_cards)}
-                        <div class="card mb-3">
-                            <div class="card-body">
-                                <div class="row">
-                                    <div class="col">
-                                        <div>出来高支払合計: {progress_total:,}円</div>
-                                        <div>工種請負残額: {contract_remaining:,}円</div>
-                                    </div>
-                                </div>
-                            </div>
-                        </div>
-                    </div>'''
-
-                # 支払い情報の表示
-                payments_display = f'''
-                <div class="row">
-                    {contract_payments_html}
-                    {progress_payments_html}
-                    {non_contract_payments_html}
-                </div>
-                '''
-
-                budgets_html += f'''
-                <tr>
-                    <td colspan="5">
-                        <div class="card mb-4" id="budget_{budget.id}">
-                            <div class="card-header bg-primary text-white">
-                                <h4 class="mb-0">{budget.code} - {budget.name}</h4>
-                            </div>
-                            <div class="card-body">
-                                <div class="row mb-3">
-                                    <div class="col">
-                                        <h5>予算金額: {budget.amount:,}円</h5>
-                                    </div>
-                                </div>
-                                <div class="row">
-                                    <div class="col">
-                                        <div>請負支払計: {contract_total:,}円</div>
-                                        <div>出来高支払計: {progress_total:,}円</div>
-                                        <div>請負外支払計: {non_contract_total:,}円</div>
-                                        <div>支払残: {contract_remaining:,}円</div>
-                                    </div>
-                                    <div class="col text-end">
-                                        <div class="btn-group" role="group">
-                                            <button type="button" class="btn btn-info" data-bs-toggle="modal" data-bs-target="#paymentModal{budget.id}">
-                                                支払い入力
-                                            </button>
-                                            <button type="button" class="btn btn-warning" data-bs-toggle="modal" data-bs-target="#editBudgetModal{budget.id}">
-                                                編集
-                                            </button>
-                                            <button type="button" class="btn btn-danger" data-bs-toggle="modal" data-bs-target="#deleteBudgetModal{budget.id}">
-                                                削除
-                                            </button>
-                                        </div>
-                                    </div>
-                                </div>
-                                {payments_display}
-
-                                <!-- 支払い入力モーダル -->
-                                <div class="modal fade" id="paymentModal{budget.id}" tabindex="-1">
-                                    <div class="modal-dialog">
-                                        <div class="modal-content">
-                                            <div class="modal-header">
-                                                <h5 class="modal-title">支払い入力</h5>
-                                                <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
-                                            </div>
-                                            <div class="modal-body">
-                                                <form action="/budget/{budget.id}/payment/add" method="POST">
-                                                    <div class="row mb-3">
-                                                        <div class="col">
-                                                            <label for="payment_year" class="form-label">年</label>
-                                                            <select class="form-select" id="payment_year" name="payment_year" required>
-                                                                {''.join(year_options)}
-                                                            </select>
-                                                        </div>
-                                                        <div class="col">
-                                                            <label for="payment_month" class="form-label">月</label>
-                                                            <select class="form-select" id="payment_month" name="payment_month" required>
-                                                                {''.join(month_options)}
-                                                            </select>
-                                                        </div>
-                                                    </div>
-                                                    <div class="mb-3">
-                                                        <label for="vendor_name" class="form-label">業者名</label>
-                                                        <input type="text" class="form-control" id="vendor_name" name="vendor_name" required>
-                                                    </div>
-                                                    <div class="mb-3">
-                                                        <label for="payment_amount" class="form-label">金額</label>
-                                                        <input type="number" class="form-control" id="payment_amount" name="payment_amount" required>
-                                                    </div>
-                                                    <div class="mb-3">
-                                                        <div class="form-check">
-                                                            <input class="form-check-input" type="radio" name="is_contract" id="is_contract_true{budget.id}" value="true" checked>
-                                                            <label class="form-check-label" for="is_contract_true{budget.id}">
-                                                                請負
-                                                            </label>
-                                                        </div>
-                                                        <div class="form-check">
-                                                            <input class="form-check-input" type="radio" name="is_contract" id="is_contract_false{budget.id}" value="false">
-                                                            <label class="form-check-label" for="is_contract_false{budget.id}">
-                                                                請負外
-                                                            </label>
-                                                        </div>
-                                                    </div>
-                                                    <div class="mb-3">
-                                                        <label for="payment_note" class="form-label">備考</label>
-                                                        <textarea class="form-control" id="payment_note" name="payment_note" rows="3"></textarea>
-                                                    </div>
-                                                    <div class="text-end">
-                                                        <button type="submit" class="btn btn-primary">登録</button>
-                                                    </div>
-                                                </form>
-                                            </div>
-                                        </div>
-                                    </div>
-                                </div>
-
-                                <!-- 工種編集モーダル -->
-                                <div class="modal fade" id="editBudgetModal{budget.id}" tabindex="-1">
-                                    <div class="modal-dialog">
-                                        <div class="modal-content">
-                                            <div class="modal-header">
-                                                <h5 class="modal-title">工種編集</h5>
-                                                <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
-                                            </div>
-                                            <div class="modal-body">
-                                                <form action="/budget/{budget.id}/edit" method="POST">
-                                                    <div class="mb-3">
-                                                        <label for="code" class="form-label">工種コード</label>
-                                                        <select class="form-select" id="code" name="code" onchange="updateConstructionName(this)" required>
-                                                            <option value="">工種を選択してください</option>
-''' + '\n'.join([f'                                                            <option value="{code}" data-name="{name}" {"selected" if code == budget.code else ""}>{code} - {name}</option>' for code, name in CONSTRUCTION_TYPES.items()]) + '''
-                                                        </select>
-                                                    </div>
-                                                    <div class="mb-3">
-                                                        <label for="name" class="form-label">工種名</label>
-                                                        <input type="text" class="form-control" id="name" name="name" value="{budget.name}" readonly required>
-                                                    </div>
-                                                    <div class="mb-3">
-                                                        <label for="amount" class="form-label">金額</label>
-                                                        <input type="number" class="form-control" id="amount" name="amount" value="{budget.amount}" required>
-                                                    </div>
-                                                    <div class="text-end">
-                                                        <button type="submit" class="btn btn-primary">更新</button>
-                                                    </div>
-                                                </form>
-                                            </div>
-                                        </div>
-                                    </div>
-                                </div>
-
-                                <!-- 工種削除確認モーダル -->
-                                <div class="modal fade" id="deleteBudgetModal{budget.id}" tabindex="-1">
-                                    <div class="modal-dialog">
-                                        <div class="modal-content">
-                                            <div class="modal-header">
-                                                <h5 class="modal-title">工種削除の確認</h5>
-                                                <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
-                                            </div>
-                                            <div class="modal-body">
-                                                <p>工種「{budget.name}」を削除してもよろしいですか？</p>
-                                                <p class="text-danger">この操作は取り消せません。</p>
-                                            </div>
-                                            <div class="modal-footer">
-                                                <form action="/budget/{budget.id}/delete" method="POST">
-                                                    <button type="button" class="btn btn-secondary" data-bs-dismiss="modal">キャンセル</button>
-                                                    <button type="submit" class="btn btn-danger">削除</button>
-                                                </form>
-                                            </div>
-                                        </div>
-                                    </div>
-                                </div>
-                            </div>
-                        </div>
-                    </td>
-                </tr>
-                '''
-            
-            return f'''
-            <!DOCTYPE html>
-            <html lang="ja">
-            <head>
-                <meta charset="utf-8">
-                <title>{property.name} - 工種一覧 - 予算管理システム</title>
-                <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-            </head>
-            <body>
-                <nav class="navbar navbar-expand-lg navbar-dark bg-primary">
-                    <div class="container">
-                        <a class="navbar-brand" href="/">予算管理システム</a>
-                        <div class="navbar-nav ms-auto">
-                            <a class="nav-link" href="/budgets">物件一覧</a>
-                            <a class="nav-link" href="/logout">ログアウト</a>
-                        </div>
-                    </div>
-                </nav>
-                
-                <div class="container mt-4">
-                    <div class="row mb-4">
-                        <div class="col">
-                            <h2>{property.name} - 工種一覧</h2>
-                            <p>契約金額: {property.contract_amount:,}円 / 予算金額: {property.budget_amount:,}円</p>
-                            <p>工種合計: {total_amount:,}円</p>
-                        </div>
-                        <div class="col text-end">
-                            <button type="button" class="btn btn-primary" data-bs-toggle="modal" data-bs-target="#addBudgetModal">
-                                新規工種登録
-                            </button>
-                        </div>
-                    </div>
-                    
-                    <div class="table-responsive">
-                        <table class="table table-striped">
-                            <thead>
-                                <tr>
-                                    <th>工種コード</th>
-                                    <th>工種名</th>
-                                    <th>予算金額</th>
-                                    <th>支払状況</th>
-                                    <th>操作</th>
-                                </tr>
-                            </thead>
-                            <tbody>
-                                {budgets_html}
-                            </tbody>
-                        </table>
-                    </div>
-                </div>
-
-                <!-- 新規工種登録モーダル -->
-                <div class="modal fade" id="addBudgetModal" tabindex="-1">
-                    <div class="modal-dialog">
-                        <div class="modal-content">
-                            <div class="modal-header">
-                                <h5 class="modal-title">新規工種登録</h5>
-                                <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
-                            </div>
-                            <div class="modal-body">
-                                <form action="/property/{property_id}/budget/add" method="POST">
-                                    <div class="mb-3">
-                                        <label for="code" class="form-label">工種コード</label>
-                                        <select class="form-select" id="code" name="code" onchange="updateConstructionName(this)" required>
-                                            <option value="">工種を選択してください</option>
-''' + '\n'.join([f'                                            <option value="{code}" data-name="{name}">{code} - {name}</option>' for code, name in CONSTRUCTION_TYPES.items()]) + '''
-                                        </select>
-                                    </div>
-                                    <div class="mb-3">
-                                        <label for="name" class="form-label">工種名</label>
-                                        <input type="text" class="form-control" id="name" name="name" readonly required>
-                                    </div>
-                                    <div class="mb-3">
-                                        <label for="amount" class="form-label">金額</label>
-                                        <input type="number" class="form-control" id="amount" name="amount" required>
-                                    </div>
-                                    <div class="text-end">
-                                        <button type="submit" class="btn btn-primary">登録</button>
-                                    </div>
-                                </form>
-                            </div>
-                        </div>
-                    </div>
-                </div>
-
-                <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
-                <script>
-                    function updateConstructionName(selectElement) {
-                        const nameInput = selectElement.closest('.modal-body').querySelector('[name="name"]');
-                        const selectedOption = selectElement.options[selectElement.selectedIndex];
-                        nameInput.value = selectedOption.value ? selectedOption.dataset.name : '';
-                    }
-                </script>
-            </body>
-            </html>
-            '''
+            # 工種合計
+            total_amount = sum(summary.budget.amount for summary in summaries)
+            
+            response = make_response(render_template(
+                'property_detail.html',
+                property=property,
+                budget_cards=render_budget_cards(property_id, summaries, ctx),
+                total_amount=total_amount,
+                ctx=ctx
+            ))
+            return set_page_etag(response, etag)
         except Exception as e:
             app.logger.error(f'工種一覧ページ処理エラー: {str(e)}')
             app.logger.error(f'エラーの詳細: {e.__class__.__name__}')
             return redirect('/budgets')
 
+    @app.route('/property/<int:property_id>/cash_flow')
+    @login_required
+    def cash_flow(property_id):
+        try:
+            property = Property.query.get_or_404(property_id)
+            
+            # 権限チェック
+            if property.user_id != current_user.id:
+                return redirect('/budgets')
+            
+            # 物件の版数が変わっていなければ、支払いを集計せずに 304 を返す
+            etag = page_etag(app.config['ETAG_SALT'], current_user.id, 'cash_flow', property.id, property.version)
+            if request.if_none_match.contains_weak(etag):
+                return not_modified(etag)
+            
+            report = get_cash_flow(property_id)
+            response = make_response(render_template('cash_flow.html', property=property, report=report))
+            return set_page_etag(response, etag)
+        except Exception as e:
+            app.logger.error(f'資金繰り表の処理エラー: {str(e)}')
+            return redirect(f'/property/{property_id}')
+
+    @app.route('/budget/<int:budget_id>/fragment')
+    @login_required
+    def budget_fragment(budget_id):
+        budget = ConstructionBudget.query.get_or_404(budget_id)
+        
+        # 権限チェック
+        if budget.property.user_id != current_user.id:
+            return '', 403
+        
+        limit = app.config['PAYMENT_HISTORY_PAGE_SIZE']
+        
+        # 業者の支払い履歴の続き（カーソル以降の行のみ）
+        vendor_name = request.args.get('vendor')
+        if vendor_name is not None:
+            try:
+                after = decode_cursor(request.args.get('after', ''))
+            except ValueError:
+                return '', 400
+            progress = request.args.get('kind') == 'progress'
+            payments, next_cursor = get_vendor_payment_page(budget_id, vendor_name, progress, after, limit)
+            vendor = VendorHistory(vendor_name, None, payments, next_cursor)
+            history_rows = get_template_attribute('_budget_macros.html', 'history_rows')
+            return history_rows(budget, vendor, progress)
+        
+        # 工種カード本体（業者別合計と各業者の支払い履歴の先頭ページ）
+        summary = BudgetSummary.from_budget(budget)
+        vendor_groups = get_vendor_histories(budget_id, limit)
+        budget_body = get_template_attribute('_budget_macros.html', 'budget_body')
+        return budget_body(summary, vendor_groups, property_page_context())
+
     @app.route('/property/<int:property_id>/edit', methods=['POST'])
     @login_required
     def edit_property(property_id):
@@ -1293,6 +927,7 @@ def create_app():
             property.contract_amount = int(contract_amount)
             property.budget_amount = int(budget_amount)
             
+            property.bump_version()
             db.session.commit()
             app.logger.info(f'物件を更新しました: {code}')
             
@@ -1351,6 +986,7 @@ def create_app():
             )
             
             db.session.add(budget)
+            property.bump_version()
             db.session.commit()
             app.logger.info(f'工種を登録しました: {code}')
             
@@ -1381,7 +1017,9 @@ def create_app():
             budget.name = name
             budget.amount = int(amount)
             
+            budget.property.bump_version()
             db.session.commit()
+            fragment_cache.invalidate(budget_id)
             app.logger.info(f'工種を更新しました: {code}')
             
             return redirect(f'/property/{budget.property_id}#budget_{budget_id}')
@@ -1402,7 +1040,9 @@ def create_app():
                 return redirect('/budgets')
             
             db.session.delete(budget)
+            budget.property.bump_version()
             db.session.commit()
+            fragment_cache.invalidate(budget_id)
             app.logger.info(f'工種を削除しました: {budget.code}')
             
             return redirect(f'/property/{property_id}')
@@ -1442,7 +1082,10 @@ def create_app():
             )
             
             db.session.add(payment)
+            update_budget_totals(budget, after=payment_totals(payment))
+            budget.property.bump_version()
             db.session.commit()
+            fragment_cache.invalidate(budget_id)
             app.logger.info(f'支払いを登録しました: {payment_year}年{payment_month}月 - {payment_amount}円')
             
             return redirect(f'/property/{budget.property_id}#budget_{budget_id}')
@@ -1451,6 +1094,77 @@ def create_app():
             app.logger.error(f'支払い登録エラー: {str(e)}')
             return redirect(f'/property/{budget.property_id}')
 
+    @app.route('/property/<int:property_id>/payments/import', methods=['POST'])
+    @login_required
+    def import_property_payments(property_id):
+        property = Property.query.get_or_404(property_id)
+
+        # 権限チェック
+        if property.user_id != current_user.id:
+            return redirect('/budgets')
+
+        wants_json = request.accept_mimetypes.best == 'application/json'
+        upload = request.files.get('file')
+        skip_invalid = request.form.get('skip_invalid') == 'true'
+        try:
+            if upload is None or not upload.filename:
+                raise PaymentImportError('取り込むファイルを選択してください')
+            rows = read_rows(upload.stream, upload.filename, request.form.get('encoding') or 'utf-8-sig')
+            result = import_payments(property_id, rows, skip_invalid, app.config['PAYMENT_IMPORT_BATCH_SIZE'])
+        except PaymentImportError as e:
+            app.logger.warning(f'支払い取込エラー: 物件ID {property_id} - {str(e)}')
+            if wants_json:
+                return jsonify({'error': str(e)}), 400
+            return render_template('payment_import_result.html', property=property, error=str(e)), 400
+        except Exception as e:
+            app.logger.error(f'支払い取込エラー: {str(e)}')
+            if wants_json:
+                return jsonify({'error': '支払いの取込に失敗しました'}), 500
+            return render_template('payment_import_result.html', property=property, error='支払いの取込に失敗しました'), 500
+
+        for budget_id in result.budget_ids:
+            fragment_cache.invalidate(budget_id)
+        app.logger.info(f'支払いを取り込みました: 物件ID {property_id} - {result.inserted}件（エラー {result.error_count}件）')
+
+        status = 200 if result.committed else 422
+        if wants_json:
+            return jsonify({
+                'inserted': result.inserted,
+                'committed': result.committed,
+                'error_count': result.error_count,
+                'errors': [error._asdict() for error in result.errors]
+            }), status
+        return render_template('payment_import_result.html', property=property, result=result), status
+
+    @app.route('/property/<int:property_id>/export.<fmt>')
+    @login_required
+    def export_property(property_id, fmt):
+        property = Property.query.get_or_404(property_id)
+
+        # 権限チェック
+        if property.user_id != current_user.id:
+            return redirect('/budgets')
+
+        # 行はセッションとは別の接続からサーバー側カーソルで読み、生成しながら送る
+        if fmt == 'csv':
+            table = request.args.get('table', 'payments')
+            if table not in EXPORT_TABLES:
+                return '', 400
+            body = iter_csv(db.engine, property_id, table)
+            mimetype = 'text/csv'
+            filename = f'{property.code}_{"支払い" if table == "payments" else "工種"}.csv'
+        elif fmt == 'xlsx':
+            body = iter_xlsx(db.engine, property_id)
+            mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            filename = f'{property.code}.xlsx'
+        else:
+            return '', 404
+
+        app.logger.info(f'物件データを出力します: 物件ID {property_id} - {filename}')
+        response = Response(body, mimetype=mimetype)
+        response.headers.set('Content-Disposition', 'attachment', filename=filename)
+        return response
+
     @app.route('/payment/<int:payment_id>/edit', methods=['POST'])
     @login_required
     def edit_payment(payment_id):
@@ -1470,12 +1184,16 @@ def create_app():
             if not all([payment_year, payment_month, payment_amount]):
                 return redirect(f'/property/{budget.property_id}')
             
+            before = payment_totals(payment)
             payment.year = int(payment_year)
             payment.month = int(payment_month)
             payment.amount = int(payment_amount)
             payment.note = payment_note
+            update_budget_totals(budget, before=before, after=payment_totals(payment))
             
+            budget.property.bump_version()
             db.session.commit()
+            fragment_cache.invalidate(budget.id)
             app.logger.info(f'支払いを更新しました: {payment_year}年{payment_month}月 - {payment_amount}円')
             
             return redirect(f'/property/{budget.property_id}#budget_{budget.id}')
@@ -1497,7 +1215,10 @@ def create_app():
                 return redirect('/budgets')
             
             db.session.delete(payment)
+            update_budget_totals(budget, before=payment_totals(payment))
+            budget.property.bump_version()
             db.session.commit()
+            fragment_cache.invalidate(budget.id)
             app.logger.info(f'支払いを削除しました: {payment.year}年{payment.month}月 - {payment.amount}円')
             
             return redirect(f'/property/{property_id}#budget_{budget.id}')
@@ -1536,9 +1257,15 @@ def create_app():
             # 請負額の更新（最新の支払いを更新）
             if payments:
                 latest_payment = max(payments, key=lambda x: (x.year, x.month))
+                before = payment_totals(latest_payment)
                 latest_payment.amount = int(contract_amount)
+                update_budget_totals(budget, before=before, after=payment_totals(latest_payment))
+            else:
+                update_budget_totals(budget)
             
+            budget.property.bump_version()
             db.session.commit()
+            fragment_cache.invalidate(budget_id)
             app.logger.info(f'業者情報を更新しました: {old_vendor_name} → {new_vendor_name}, 請負額: {contract_amount}円')
             
             return redirect(f'/property/{budget.property_id}#budget_{budget_id}')
@@ -1562,13 +1289,16 @@ def create_app():
             if not vendor_name:
                 return redirect(f'/property/{budget.property_id}')
             
-            # 業者の支払い情報を削除
+            # 業者の支払い情報を削除（削除分を集計から差し引く）
+            update_budget_totals(budget, before=vendor_totals(budget_id, vendor_name))
             Payment.query.filter_by(
                 construction_budget_id=budget_id,
                 vendor_name=vendor_name
             ).delete()
             
+            budget.property.bump_version()
             db.session.commit()
+            fragment_cache.invalidate(budget_id)
             app.logger.info(f'業者の支払い情報を削除しました: {vendor_name}')
             
             return redirect(f'/property/{budget.property_id}#budget_{budget_id}')
@@ -1577,11 +1307,317 @@ def create_app():
             app.logger.error(f'業者削除エラー: {str(e)}')
             return redirect(f'/property/{budget.property_id}')
 
+    # JSON API（/api/v1）
+    @app.errorhandler(ApiError)
+    def api_error(error):
+        return error_response(error.message, error.status)
+
+    @app.route(f'{API_PREFIX}/properties', methods=['GET'])
+    @api_login_required
+    def api_list_properties():
+        rollups = get_property_rollups(current_user.id)
+        return json_response({
+            'properties': [serialize_property(*rollup) for rollup in rollups]
+        }, conditional=True)
+
+    @app.route(f'{API_PREFIX}/properties', methods=['POST'])
+    @api_login_required
+    def api_create_property():
+        values = property_values(request_data())
+        if Property.query.filter_by(code=values['code']).first() is not None:
+            raise ApiError('この物件コードは既に使用されています', 409)
+        try:
+            property = Property(user_id=current_user.id, **values)
+            db.session.add(property)
+            db.session.commit()
+            app.logger.info(f'新規物件を登録しました（API）: {property.code}')
+            return json_response(serialize_property(property, 0, 0), 201)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f'物件登録エラー（API）: {str(e)}')
+            return error_response('物件の登録に失敗しました', 500)
+
+    @app.route(f'{API_PREFIX}/properties/<int:property_id>', methods=['GET'])
+    @api_login_required
+    def api_get_property(property_id):
+        property = owned_property(property_id)
+        budget_total, paid_total = db.session.query(
+            db.func.coalesce(db.func.sum(ConstructionBudget.amount), 0),
+            db.func.coalesce(db.func.sum(
+                ConstructionBudget.contract_total + ConstructionBudget.progress_total + ConstructionBudget.non_contract_total
+            ), 0)
+        ).filter(ConstructionBudget.property_id == property_id).one()
+        return json_response(serialize_property(property, budget_total, paid_total), conditional=True)
+
+    @app.route(f'{API_PREFIX}/properties/<int:property_id>', methods=['PUT', 'PATCH'])
+    @api_login_required
+    def api_update_property(property_id):
+        property = owned_property(property_id)
+        values = property_values(request_data(), partial=request.method == 'PATCH')
+        if 'code' in values and Property.query.filter(
+            Property.code == values['code'], Property.id != property_id
+        ).first() is not None:
+            raise ApiError('この物件コードは既に使用されています', 409)
+        try:
+            for name, value in values.items():
+                setattr(property, name, value)
+            property.bump_version()
+            db.session.commit()
+            app.logger.info(f'物件を更新しました（API）: {property.code}')
+            return json_response(serialize_property(property))
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f'物件更新エラー（API）: {str(e)}')
+            return error_response('物件の更新に失敗しました', 500)
+
+    @app.route(f'{API_PREFIX}/properties/<int:property_id>', methods=['DELETE'])
+    @api_login_required
+    def api_delete_property(property_id):
+        property = owned_property(property_id)
+        try:
+            # 工種・支払いをまとめて削除する
+            budget_ids = [budget_id for budget_id, in db.session.query(ConstructionBudget.id).filter_by(property_id=property_id)]
+            if budget_ids:
+                Payment.query.filter(Payment.construction_budget_id.in_(budget_ids)).delete(synchronize_session=False)
+                ConstructionBudget.query.filter_by(property_id=property_id).delete(synchronize_session=False)
+            db.session.delete(property)
+            db.session.commit()
+            for budget_id in budget_ids:
+                fragment_cache.invalidate(budget_id)
+            app.logger.info(f'物件を削除しました（API）: {property.code}')
+            return '', 204
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f'物件削除エラー（API）: {str(e)}')
+            return error_response('物件の削除に失敗しました', 500)
+
+    @app.route(f'{API_PREFIX}/properties/<int:property_id>/budgets', methods=['GET'])
+    @api_login_required
+    def api_list_budgets(property_id):
+        owned_property(property_id)
+        return json_response({'budgets': list_budgets(property_id)}, conditional=True)
+
+    @app.route(f'{API_PREFIX}/properties/<int:property_id>/budgets', methods=['POST'])
+    @api_login_required
+    def api_create_budget(property_id):
+        property = owned_property(property_id)
+        values = budget_values(request_data())
+        try:
+            budget = ConstructionBudget(property_id=property_id, **values)
+            db.session.add(budget)
+            property.bump_version()
+            db.session.commit()
+            app.logger.info(f'工種を登録しました（API）: {budget.code}')
+            return json_response(serialize_budget(budget), 201)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f'工種登録エラー（API）: {str(e)}')
+            return error_response('工種の登録に失敗しました', 500)
+
+    @app.route(f'{API_PREFIX}/budgets/<int:budget_id>', methods=['GET'])
+    @api_login_required
+    def api_get_budget(budget_id):
+        return json_response(serialize_budget(owned_budget(budget_id)), conditional=True)
+
+    @app.route(f'{API_PREFIX}/budgets/<int:budget_id>', methods=['PUT', 'PATCH'])
+    @api_login_required
+    def api_update_budget(budget_id):
+        budget = owned_budget(budget_id)
+        values = budget_values(request_data(), partial=request.method == 'PATCH')
+        try:
+            for name, value in values.items():
+                setattr(budget, name, value)
+            budget.property.bump_version()
+            db.session.commit()
+            fragment_cache.invalidate(budget_id)
+            app.logger.info(f'工種を更新しました（API）: {budget.code}')
+            return json_response(serialize_budget(budget))
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f'工種更新エラー（API）: {str(e)}')
+            return error_response('工種の更新に失敗しました', 500)
+
+    @app.route(f'{API_PREFIX}/budgets/<int:budget_id>', methods=['DELETE'])
+    @api_login_required
+    def api_delete_budget(budget_id):
+        budget = owned_budget(budget_id)
+        try:
+            db.session.delete(budget)
+            budget.property.bump_version()
+            db.session.commit()
+            fragment_cache.invalidate(budget_id)
+            app.logger.info(f'工種を削除しました（API）: {budget.code}')
+            return '', 204
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f'工種削除エラー（API）: {str(e)}')
+            return error_response('工種の削除に失敗しました', 500)
+
+    @app.route(f'{API_PREFIX}/budgets/<int:budget_id>/payments', methods=['GET'])
+    @api_login_required
+    def api_list_payments(budget_id):
+        owned_budget(budget_id)
+        # after（前のページの next_after）以降の支払いを id 順に limit 件
+        limit = request.args.get('limit', app.config['API_PAGE_SIZE'], type=int)
+        limit = max(1, min(limit, app.config['API_MAX_PAGE_SIZE']))
+        after_id = request.args.get('after', type=int)
+        payments, next_after = list_payments(budget_id, after_id, limit)
+        return json_response({'payments': payments, 'next_after': next_after}, conditional=True)
+
+    @app.route(f'{API_PREFIX}/budgets/<int:budget_id>/payments', methods=['POST'])
+    @api_login_required
+    def api_create_payment(budget_id):
+        budget = owned_budget(budget_id)
+        values = payment_values(request_data())
+        try:
+            payment = Payment(construction_budget_id=budget_id, **values)
+            db.session.add(payment)
+            update_budget_totals(budget, after=payment_totals(payment))
+            budget.property.bump_version()
+            db.session.commit()
+            fragment_cache.invalidate(budget_id)
+            app.logger.info(f'支払いを登録しました（API）: {payment.year}年{payment.month}月 - {payment.amount}円')
+            return json_response(serialize_payment(payment), 201)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f'支払い登録エラー（API）: {str(e)}')
+            return error_response('支払いの登録に失敗しました', 500)
+
+    @app.route(f'{API_PREFIX}/payments/<int:payment_id>', methods=['GET'])
+    @api_login_required
+    def api_get_payment(payment_id):
+        return json_response(serialize_payment(owned_payment(payment_id)), conditional=True)
+
+    @app.route(f'{API_PREFIX}/payments/<int:payment_id>', methods=['PUT', 'PATCH'])
+    @api_login_required
+    def api_update_payment(payment_id):
+        payment = owned_payment(payment_id)
+        budget = payment.construction_budget
+        values = payment_values(request_data(), partial=request.method == 'PATCH')
+        try:
+            before = payment_totals(payment)
+            for name, value in values.items():
+                setattr(payment, name, value)
+            payment.payment_type = '請負' if payment.is_contract else '請負外'
+            update_budget_totals(budget, before=before, after=payment_totals(payment))
+            budget.property.bump_version()
+            db.session.commit()
+            fragment_cache.invalidate(budget.id)
+            app.logger.info(f'支払いを更新しました（API）: {payment.year}年{payment.month}月 - {payment.amount}円')
+            return json_response(serialize_payment(payment))
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f'支払い更新エラー（API）: {str(e)}')
+            return error_response('支払いの更新に失敗しました', 500)
+
+    @app.route(f'{API_PREFIX}/payments/<int:payment_id>', methods=['DELETE'])
+    @api_login_required
+    def api_delete_payment(payment_id):
+        payment = owned_payment(payment_id)
+        budget = payment.construction_budget
+        try:
+            db.session.delete(payment)
+            update_budget_totals(budget, before=payment_totals(payment))
+            budget.property.bump_version()
+            db.session.commit()
+            fragment_cache.invalidate(budget.id)
+            app.logger.info(f'支払いを削除しました（API）: {payment.year}年{payment.month}月 - {payment.amount}円')
+            return '', 204
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f'支払い削除エラー（API）: {str(e)}')
+            return error_response('支払いの削除に失敗しました', 500)
+
+    @app.route('/admin/fragment_cache')
+    @login_required
+    def fragment_cache_stats():
+        if not current_user.is_admin:
+            return redirect('/budgets')
+        return jsonify(fragment_cache.stats())
+
+    # データベース疎通確認の結果（ワーカーごと、HEALTHZ_PING_TTL 秒は再利用する）
+    db_ping = {'ok': None, 'latency_ms': None, 'checked_at': 0.0}
+    db_ping_lock = Lock()
+
+    @app.route('/healthz')
+    def healthz():
+        with db_ping_lock:
+            if monotonic() - db_ping['checked_at'] >= app.config['HEALTHZ_PING_TTL']:
+                start = monotonic()
+                try:
+                    with db.engine.connect() as conn:
+                        conn.execute(db.text('SELECT 1'))
+                    db_ping['ok'] = True
+                except Exception as e:
+                    app.logger.error(f'ヘルスチェックのデータベース接続エラー: {str(e)}')
+                    db_ping['ok'] = False
+                db_ping['latency_ms'] = round((monotonic() - start) * 1000, 1)
+                db_ping['checked_at'] = monotonic()
+            database = {
+                'ok': db_ping['ok'],
+                'latency_ms': db_ping['latency_ms'],
+                'age_s': round(monotonic() - db_ping['checked_at'], 1)
+            }
+        
+        body = {
+            'status': 'ok' if database['ok'] else 'error',
+            'database': database,
+            'pool': pool_status(db.engine.pool)
+        }
+        return jsonify(body), 200 if database['ok'] else 503
+
+    @app.route('/admin/user_cache')
+    @login_required
+    def user_cache_stats():
+        if not current_user.is_admin:
+            return redirect('/budgets')
+        return jsonify(user_cache.stats())
+
+    @app.cli.command('rebuild-budget-summary')
+    @click.option('--batch-size', default=500, show_default=True, help='1回のコミットで再計算する工種数')
+    def rebuild_budget_summary(batch_size):
+        """工種の支払集計を支払いから再計算する
+
+        修正した工種の updated_at と物件の版数が更新されるため、各ワーカーのフラグメントキャッシュと
+        ブラウザの ETag は次のリクエストで無効になる（このプロセスのキャッシュを消しても効果はない）。
+        """
+        corrected = rebuild_budget_totals(batch_size)
+        click.echo(f'工種の支払集計を再計算し、{corrected}件を修正しました')
+
+    @app.cli.command('import-payments')
+    @click.argument('property_code')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--encoding', default='utf-8-sig', show_default=True, help='CSVの文字コード（例: cp932）')
+    @click.option('--skip-invalid', is_flag=True, help='不備のある行を除いて登録する')
+    @click.option('--batch-size', default=1000, show_default=True, help='1回の挿入でまとめる行数')
+    def import_payments_command(property_code, path, encoding, skip_invalid, batch_size):
+        """CSV/XLSX の支払いを物件（物件コード）に一括登録する"""
+        property = Property.query.filter_by(code=property_code).first()
+        if property is None:
+            raise click.ClickException(f'物件コード {property_code} の物件がありません')
+
+        try:
+            with open(path, 'rb') as f:
+                result = import_payments(property.id, read_rows(f, path, encoding), skip_invalid, batch_size)
+        except PaymentImportError as e:
+            raise click.ClickException(str(e))
+
+        for error in result.errors:
+            click.echo(f'{error.row}行目: {error.message}', err=True)
+        if result.error_count > len(result.errors):
+            click.echo(f'ほか{result.error_count - len(result.errors)}件のエラー', err=True)
+        if not result.committed:
+            raise click.ClickException(f'{result.error_count}件のエラーがあるため登録しませんでした')
+        fragment_cache.clear()
+        click.echo(f'{result.inserted}件の支払いを登録しました')
+
     # エラーハンドラ
     @app.errorhandler(404)
     def not_found_error(error):
         if request.method == 'HEAD':
             return '', 200
+        if request.path.startswith(API_PREFIX):
+            return error_response('見つかりません', 404)
         return '''
         <!DOCTYPE html>
         <html lang="ja">
@@ -1608,6 +1644,8 @@ def create_app():
     @app.errorhandler(500)
     def internal_error(error):
         db.session.rollback()
+        if request.path.startswith(API_PREFIX):
+            return error_response('サーバーエラーが発生しました', 500)
         return '''
         <!DOCTYPE html>
         <html lang="ja">
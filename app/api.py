@@ -0,0 +1,236 @@
+import json
+from datetime import date
+from functools import wraps
+from operator import attrgetter
+
+from flask import Response, request
+from flask_login import current_user
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import CONSTRUCTION_TYPES, ConstructionBudget, Payment, Property
+
+# JSON API のURLの先頭（互換性のない変更はバージョンを上げて別のURLで提供する）
+API_PREFIX = '/api/v1'
+
+PROPERTY_FIELDS = ('id', 'code', 'name', 'contract_amount', 'budget_amount', 'created_at', 'updated_at')
+BUDGET_FIELDS = (
+    'id', 'property_id', 'code', 'name', 'amount',
+    'contract_total', 'progress_total', 'non_contract_total', 'created_at', 'updated_at'
+)
+PAYMENT_FIELDS = (
+    'id', 'construction_budget_id', 'year', 'month', 'vendor_name', 'amount',
+    'is_contract', 'payment_type', 'note', 'created_at', 'updated_at'
+)
+
+_property_values = attrgetter(*PROPERTY_FIELDS)
+_budget_values = attrgetter(*BUDGET_FIELDS)
+_payment_values = attrgetter(*PAYMENT_FIELDS)
+
+
+class ApiError(Exception):
+    """JSON API のエラー応答（message と HTTP ステータス）"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} は JSON に変換できません')
+
+
+def json_response(data, status=200, conditional=False):
+    """JSON の応答を作る
+
+    conditional の場合は本文から強い ETag を付け、If-None-Match が一致すれば本文なしの 304 を返す。
+    """
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=_json_default)
+    response = Response(body, status=status, mimetype='application/json')
+    if conditional:
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
+
+def error_response(message, status):
+    return json_response({'error': message}, status)
+
+
+def api_login_required(view):
+    """未ログインの場合はログイン画面へのリダイレクトではなく 401 を返す"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return error_response('ログインが必要です', 401)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# 所有者の確認（存在しない場合は404、他のユーザーの物件の場合は403）
+
+def owned_property(property_id):
+    property = db.session.get(Property, property_id)
+    if property is None:
+        raise ApiError('物件が見つかりません', 404)
+    if property.user_id != current_user.id:
+        raise ApiError('この物件にアクセスする権限がありません', 403)
+    return property
+
+
+def owned_budget(budget_id):
+    budget = db.session.get(ConstructionBudget, budget_id)
+    if budget is None:
+        raise ApiError('工種が見つかりません', 404)
+    if budget.property.user_id != current_user.id:
+        raise ApiError('この工種にアクセスする権限がありません', 403)
+    return budget
+
+
+def owned_payment(payment_id):
+    payment = db.session.get(Payment, payment_id)
+    if payment is None:
+        raise ApiError('支払いが見つかりません', 404)
+    if payment.construction_budget.property.user_id != current_user.id:
+        raise ApiError('この支払いにアクセスする権限がありません', 403)
+    return payment
+
+
+# シリアライズ（ORMオブジェクトは属性をまとめて取り出し、一覧は列だけを取得する）
+
+def serialize_property(property, budget_total=None, paid_total=None):
+    data = dict(zip(PROPERTY_FIELDS, _property_values(property)))
+    if budget_total is not None:
+        data.update(budget_total=budget_total, paid_total=paid_total, remaining=budget_total - paid_total)
+    return data
+
+
+def serialize_budget(budget):
+    data = dict(zip(BUDGET_FIELDS, _budget_values(budget)))
+    data['total_paid'] = data['contract_total'] + data['progress_total'] + data['non_contract_total']
+    return data
+
+
+def serialize_payment(payment):
+    return dict(zip(PAYMENT_FIELDS, _payment_values(payment)))
+
+
+def list_budgets(property_id):
+    rows = db.session.execute(
+        select(*(getattr(ConstructionBudget, field) for field in BUDGET_FIELDS))
+        .where(ConstructionBudget.property_id == property_id)
+        .order_by(ConstructionBudget.id)
+    ).mappings()
+    budgets = []
+    for row in rows:
+        data = dict(row)
+        data['total_paid'] = data['contract_total'] + data['progress_total'] + data['non_contract_total']
+        budgets.append(data)
+    return budgets
+
+
+def list_payments(budget_id, after_id, limit):
+    """工種の支払いを id 順に limit 件（after_id より後）と、続きがある場合の次の after_id"""
+    query = select(*(getattr(Payment, field) for field in PAYMENT_FIELDS)).where(
+        Payment.construction_budget_id == budget_id
+    )
+    if after_id is not None:
+        query = query.where(Payment.id > after_id)
+    rows = db.session.execute(query.order_by(Payment.id).limit(limit + 1)).mappings().all()
+    payments = [dict(row) for row in rows[:limit]]
+    next_after = payments[-1]['id'] if len(rows) > limit else None
+    return payments, next_after
+
+
+# 入力値の検証
+
+def request_data():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ApiError('JSON オブジェクトを送信してください')
+    return data
+
+
+def _string(data, name, max_length):
+    value = data[name]
+    if not isinstance(value, str) or not value.strip():
+        raise ApiError(f'{name} は空でない文字列を指定してください')
+    if len(value) > max_length:
+        raise ApiError(f'{name} は{max_length}文字以内で指定してください')
+    return value.strip()
+
+
+def _integer(data, name, minimum=-2 ** 31 + 1, maximum=2 ** 31 - 1):
+    value = data[name]
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ApiError(f'{name} は整数を指定してください')
+    if not minimum <= value <= maximum:
+        raise ApiError(f'{name} は{minimum}から{maximum}の範囲で指定してください')
+    return value
+
+
+def _boolean(data, name):
+    value = data[name]
+    if not isinstance(value, bool):
+        raise ApiError(f'{name} は true または false を指定してください')
+    return value
+
+
+def _note(data, name):
+    value = data[name]
+    if value is not None and not isinstance(value, str):
+        raise ApiError(f'{name} は文字列または null を指定してください')
+    return value or None
+
+
+def _values(data, parsers, required, partial):
+    """parsers で検証した値の辞書。partial（PATCH）の場合は送信された項目のみ"""
+    if not partial:
+        missing = [name for name in required if name not in data]
+        if missing:
+            raise ApiError(f'必須項目がありません: {", ".join(missing)}')
+    unknown = [name for name in data if name not in parsers]
+    if unknown:
+        raise ApiError(f'変更できない項目です: {", ".join(unknown)}')
+    return {name: parse(data, name) for name, parse in parsers.items() if name in data}
+
+
+def property_values(data, partial=False):
+    parsers = {
+        'code': lambda d, n: _string(d, n, 20),
+        'name': lambda d, n: _string(d, n, 200),
+        'contract_amount': _integer,
+        'budget_amount': _integer,
+    }
+    return _values(data, parsers, parsers, partial)
+
+
+def budget_values(data, partial=False):
+    """工種の値（工種名を省略した場合は工種コードの名称）"""
+    parsers = {
+        'code': lambda d, n: _string(d, n, 20),
+        'name': lambda d, n: _string(d, n, 200),
+        'amount': _integer,
+    }
+    values = _values(data, parsers, ('code', 'amount'), partial)
+    if 'code' in values:
+        if values['code'] not in CONSTRUCTION_TYPES:
+            raise ApiError(f'工種コードが正しくありません: {values["code"]}')
+        values.setdefault('name', CONSTRUCTION_TYPES[values['code']])
+    return values
+
+
+def payment_values(data, partial=False):
+    parsers = {
+        'year': lambda d, n: _integer(d, n, 2000, 2100),
+        'month': lambda d, n: _integer(d, n, 1, 12),
+        'vendor_name': lambda d, n: _string(d, n, 200),
+        'amount': _integer,
+        'is_contract': _boolean,
+        'note': _note,
+    }
+    return _values(data, parsers, ('year', 'month', 'vendor_name', 'amount', 'is_contract'), partial)
@@ -0,0 +1,100 @@
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli は任意（未インストールの場合は gzip のみ）
+    brotli = None
+
+# 圧縮するレスポンスの種類（画像・ZIP形式の XLSX などは圧縮済みのため対象外）
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'image/svg+xml',
+})
+
+
+def compress(data, encoding, gzip_level=6, brotli_quality=4):
+    """data を encoding（'br' または 'gzip'）で圧縮する"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    # mtime を固定し、同じ内容から同じバイト列を作る
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+class Compressor:
+    """テキストのレスポンスを gzip（brotli がインストールされていれば brotli）で圧縮する
+
+    Accept-Encoding の q 値に従って方式を選び、COMPRESS_MIN_SIZE バイト未満や
+    ストリーミングのレスポンス、すでに Content-Encoding があるレスポンスは圧縮しない。
+    圧縮の対象になりうるレスポンスには常に Vary: Accept-Encoding を付ける。
+    圧縮すると表現が変わるため、強い ETag は弱い ETag にする（If-None-Match は弱い比較で一致する）。
+    304 も、同じリクエストの 200 が圧縮される場合は同じ弱い ETag にする。
+    """
+
+    def __init__(self, app=None, enabled=True, min_size=1024, gzip_level=6, brotli_quality=4):
+        self.enabled = enabled
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', self.enabled)
+        app.config.setdefault('COMPRESS_MIN_SIZE', self.min_size)
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', self.gzip_level)
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', self.brotli_quality)
+        self.enabled = app.config['COMPRESS_ENABLED']
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.gzip_level = app.config['COMPRESS_GZIP_LEVEL']
+        self.brotli_quality = app.config['COMPRESS_BROTLI_QUALITY']
+        # q 値が同じ場合は先にある方式を選ぶ
+        self.encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+        if 'compressor' not in app.extensions:
+            app.after_request(self.after_request)
+        app.extensions['compressor'] = self
+
+    def after_request(self, response):
+        if not self.enabled or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add('Accept-Encoding')
+
+        if response.status_code == 304:
+            # 304 には 200 で返すはずだった検証子を付ける（圧縮した 200 と同じく弱い ETag にする）
+            if request.accept_encodings.best_match(self.encodings) is not None:
+                self.weaken_etag(response)
+            return response
+
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 206)
+            or response.is_streamed
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or request.method == 'HEAD'
+        ):
+            return response
+
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        compressed = compress(data, encoding, self.gzip_level, self.brotli_quality)
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        self.weaken_etag(response)
+        return response
+
+    @staticmethod
+    def weaken_etag(response):
+        """強い ETag を弱い ETag にする"""
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
@@ -2,7 +2,16 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
 
+from app.compression import Compressor
+from app.fragment_cache import FragmentCache
+from app.passwords import PasswordHasher
+from app.user_cache import UserCache
+
 db = SQLAlchemy()
 migrate = Migrate()
 login_manager = LoginManager()
-login_manager.login_view = 'login' 
\ No newline at end of file
+login_manager.login_view = 'login' 
+fragment_cache = FragmentCache()
+user_cache = UserCache()
+password_hasher = PasswordHasher()
+compressor = Compressor()
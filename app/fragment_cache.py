@@ -0,0 +1,66 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class FragmentCache:
+    """工種IDをキーにした描画済みHTMLフラグメントのLRUキャッシュ
+
+    各エントリは変更マーカー（工種・支払いの更新日時など）と一緒に保存し、
+    取得時にマーカーが一致しない場合はミスとして扱う。
+    ワーカー間で共有されないため、他ワーカーでの更新はマーカーの不一致で検出する。
+    """
+
+    def __init__(self, app=None, maxsize=512):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FRAGMENT_CACHE_SIZE', self.maxsize)
+        self.maxsize = app.config['FRAGMENT_CACHE_SIZE']
+        app.extensions['fragment_cache'] = self
+
+    def get(self, key, marker):
+        """マーカーが一致するフラグメントを返す。なければNone"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != marker:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, marker, fragment):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (marker, fragment)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """キャッシュの利用状況"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
@@ -1,11 +1,22 @@
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
 from datetime import datetime
-from app.extensions import db, login_manager
+from app.extensions import db, login_manager, password_hasher, user_cache
+from app.user_cache import CachedUser
 
 @login_manager.user_loader
 def load_user(id):
-    return User.query.get(int(id))
+    # 通常はキャッシュから返し、認証済みリクエストごとの users テーブルへの問い合わせを省く
+    user_id = int(id)
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+    user = User.query.get(user_id)
+    if user is None:
+        return None
+    cached = CachedUser.from_user(user)
+    user_cache.set(user_id, cached)
+    return cached
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -15,10 +26,20 @@ class User(UserMixin, db.Model):
     is_admin = db.Column(db.Boolean, default=False)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """検証待ちが上限を超えた場合は PasswordVerifierBusy を送出する"""
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
+
+# ユーザーの更新（パスワード変更を含む）・削除時にキャッシュを無効にする
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def invalidate_cached_user(mapper, connection, user):
+    user_cache.invalidate(user.id)
 
 class Property(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -26,17 +47,27 @@ class Property(db.Model):
     name = db.Column(db.String(200), nullable=False)
     contract_amount = db.Column(db.Integer, nullable=False)
     budget_amount = db.Column(db.Integer, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     user = db.relationship('User', backref=db.backref('properties', lazy=True))
     created_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    # 物件・工種・支払いの変更ごとに増える版数（ETag・キャッシュの有効性の確認に使う）
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    def bump_version(self):
+        """版数を上げる（変更と同じトランザクションで「列 = 列 + 1」として更新し、同時更新でも失われない）"""
+        self.version = Property.version + 1
 
 class ConstructionBudget(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     code = db.Column(db.String(20), nullable=False)
     name = db.Column(db.String(200), nullable=False)
     amount = db.Column(db.Integer, nullable=False)
-    property_id = db.Column(db.Integer, db.ForeignKey('property.id'), nullable=False)
+    property_id = db.Column(db.Integer, db.ForeignKey('property.id'), nullable=False, index=True)
+    # 支払集計（支払いの登録・更新・削除と同じトランザクションで差分更新する）
+    contract_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 請負（出来高支払を除く）
+    progress_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 出来高支払
+    non_contract_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 請負外
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -45,6 +76,13 @@ class ConstructionBudget(db.Model):
     payments = db.relationship('Payment', backref='construction_budget', lazy=True, cascade='all, delete-orphan')
 
 class Payment(db.Model):
+    __table_args__ = (
+        # 工種内の業者別の絞り込み（業者の編集・削除、支払い履歴）と工種単位の絞り込みを兼ねる
+        db.Index('ix_payment_budget_vendor', 'construction_budget_id', 'vendor_name'),
+        # 工種内の請負／請負外の絞り込み
+        db.Index('ix_payment_budget_is_contract', 'construction_budget_id', 'is_contract'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     year = db.Column(db.Integer, nullable=False)
     month = db.Column(db.Integer, nullable=False)
@@ -0,0 +1,64 @@
+from functools import lru_cache
+from threading import BoundedSemaphore
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordVerifierBusy(Exception):
+    """同時に実行できるパスワード検証の数が上限に達し、待ち時間内に空かなかった"""
+
+
+@lru_cache(maxsize=8)
+def hash_prefix(method):
+    """method で生成されるハッシュの方式・コスト部分（例: scrypt:32768:8:1）"""
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+class PasswordHasher:
+    """ハッシュ方式・コストを設定で切り替えられるパスワードのハッシュ化と検証
+
+    検証はリクエストのスレッドでそのまま実行し、プロセス内で同時に実行する検証の数をセマフォで制限する。
+    空きを待てるのは PASSWORD_VERIFY_WAIT 秒までで、それを超えると PasswordVerifierBusy を送出する
+    （ログインは 503 を返す）。制限が効くのは gthread ワーカー（GUNICORN_THREADS > 1）の場合で、
+    ログインが集中しても残りのスレッドで他のリクエストを処理できる。sync ワーカーでは
+    同時に処理するリクエストが1件のため、同時に実行される検証の数はワーカー数で決まる。
+    同時実行数が0の場合は制限しない。
+    """
+
+    def __init__(self, app=None, method='scrypt', concurrency=0, wait=0.5):
+        self.method = method
+        self.concurrency = concurrency
+        self.wait = wait
+        self._slots = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', self.method)
+        app.config.setdefault('PASSWORD_VERIFY_CONCURRENCY', self.concurrency)
+        app.config.setdefault('PASSWORD_VERIFY_WAIT', self.wait)
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.concurrency = app.config['PASSWORD_VERIFY_CONCURRENCY']
+        self.wait = app.config['PASSWORD_VERIFY_WAIT']
+        self._slots = BoundedSemaphore(self.concurrency) if self.concurrency > 0 else None
+        app.extensions['password_hasher'] = self
+
+    def hash(self, password):
+        return generate_password_hash(password, self.method)
+
+    def needs_rehash(self, password_hash):
+        """現在の方式・コストと異なる設定で作成されたハッシュか"""
+        return password_hash.split('$', 1)[0] != hash_prefix(self.method)
+
+    def verify(self, password_hash, password):
+        if not password_hash:
+            return False
+        if self._slots is None:
+            return check_password_hash(password_hash, password)
+
+        if not self._slots.acquire(timeout=self.wait):
+            raise PasswordVerifierBusy()
+        try:
+            return check_password_hash(password_hash, password)
+        finally:
+            self._slots.release()
@@ -0,0 +1,116 @@
+import csv
+import io
+import tempfile
+from contextlib import contextmanager
+
+from sqlalchemy import select
+
+from app.models import ConstructionBudget, Payment
+
+BUDGET_HEADER = ('工種コード', '工種名', '予算金額', '請負支払', '出来高支払', '請負外支払', '総支払額', '請負残額')
+# 支払いの列は取込（app.payment_import）と同じ見出しにし、出力したファイルをそのまま取り込めるようにする
+PAYMENT_HEADER = ('工種コード', '工種名', '年', '月', '業者名', '金額', '区分', '備考')
+
+EXPORT_TABLES = ('payments', 'budgets')
+
+# サーバー側カーソルから1回に取り出す行数
+YIELD_PER = 1000
+# CSV をまとめて送る行数と、XLSX を送る単位のバイト数
+CSV_CHUNK_ROWS = 500
+XLSX_CHUNK_BYTES = 64 * 1024
+
+
+@contextmanager
+def snapshot(engine):
+    """出力用の読み取りトランザクション
+
+    セッションとは別の接続を使う。PostgreSQL では REPEATABLE READ の読み取り専用トランザクションにし、
+    工種と支払いを同じ時点のスナップショットから読む（MVCC のため書き込みを妨げない）。
+    """
+    with engine.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.execution_options(isolation_level='REPEATABLE READ', postgresql_readonly=True)
+        with connection.begin():
+            yield connection
+
+
+def budget_rows(connection, property_id):
+    """工種と支払集計の行（見出し・合計行を含む）"""
+    yield BUDGET_HEADER
+    result = connection.execute(
+        select(
+            ConstructionBudget.code, ConstructionBudget.name, ConstructionBudget.amount,
+            ConstructionBudget.contract_total, ConstructionBudget.progress_total, ConstructionBudget.non_contract_total
+        )
+        .where(ConstructionBudget.property_id == property_id)
+        .order_by(ConstructionBudget.code, ConstructionBudget.id)
+        .execution_options(yield_per=YIELD_PER)
+    )
+    totals = [0] * 6
+    for code, name, amount, contract_total, progress_total, non_contract_total in result:
+        values = (
+            amount, contract_total, progress_total, non_contract_total,
+            contract_total + progress_total + non_contract_total, amount - progress_total
+        )
+        totals = [total + value for total, value in zip(totals, values)]
+        yield (code, name) + values
+    yield ('合計', '') + tuple(totals)
+
+
+def payment_rows(connection, property_id):
+    """支払いの行（見出しを含む、工種・年月順）"""
+    yield PAYMENT_HEADER
+    result = connection.execute(
+        select(
+            ConstructionBudget.code, ConstructionBudget.name, Payment.year, Payment.month,
+            Payment.vendor_name, Payment.amount, Payment.is_contract, Payment.note
+        )
+        .join(ConstructionBudget, Payment.construction_budget_id == ConstructionBudget.id)
+        .where(ConstructionBudget.property_id == property_id)
+        .order_by(ConstructionBudget.code, ConstructionBudget.id, Payment.year, Payment.month, Payment.id)
+        .execution_options(yield_per=YIELD_PER)
+    )
+    for code, name, year, month, vendor_name, amount, is_contract, note in result:
+        yield code, name, year, month, vendor_name, amount, '請負' if is_contract else '請負外', note or ''
+
+
+def iter_csv(engine, property_id, table):
+    """CSV を少しずつ生成する（Excel で開けるよう BOM 付き UTF-8）"""
+    rows = payment_rows if table == 'payments' else budget_rows
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    with snapshot(engine) as connection:
+        for count, row in enumerate(rows(connection, property_id), start=1):
+            writer.writerow(row)
+            if count % CSV_CHUNK_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_xlsx(engine, property_id):
+    """工種・支払いの2シートの XLSX を生成する
+
+    write_only のブックは追加した行を一時ファイルへ書き出すため、支払い件数によらずメモリ使用量は一定。
+    ZIP の書き出しはすべての行を追加した後になるため、一時ファイルに保存してから少しずつ送る。
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    with snapshot(engine) as connection:
+        for title, rows in (('工種', budget_rows), ('支払い', payment_rows)):
+            sheet = workbook.create_sheet(title)
+            for row in rows(connection, property_id):
+                sheet.append(row)
+
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while True:
+            chunk = f.read(XLSX_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+
@@ -0,0 +1,249 @@
+import csv
+import io
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.extensions import db
+from app.models import CONSTRUCTION_TYPES, ConstructionBudget, Payment, Property
+from app.summary import SUMMARY_COLUMNS, summary_column, update_budget_totals
+
+# 見出し（1行目）の列名と取り込み先の項目
+HEADER_ALIASES = {
+    '工種コード': 'code', 'code': 'code',
+    '年': 'year', 'year': 'year',
+    '月': 'month', 'month': 'month',
+    '業者名': 'vendor_name', '業者': 'vendor_name', 'vendor': 'vendor_name',
+    '金額': 'amount', '支払金額': 'amount', 'amount': 'amount',
+    '区分': 'kind', '請負/請負外': 'kind', 'kind': 'kind',
+    '備考': 'note', 'note': 'note',
+}
+REQUIRED_FIELDS = {
+    'code': '工種コード', 'year': '年', 'month': '月', 'vendor_name': '業者名', 'amount': '金額', 'kind': '区分'
+}
+
+# 区分の値と is_contract
+KINDS = {'請負': True, '請負外': False}
+
+# 挿入する列（COPY の列順）
+INSERT_COLUMNS = (
+    'year', 'month', 'vendor_name', 'amount', 'is_contract', 'payment_type', 'note',
+    'construction_budget_id', 'created_at', 'updated_at'
+)
+
+# 結果に含める行エラーの上限（件数は error_count にすべて数える）
+MAX_REPORTED_ERRORS = 100
+
+RowError = namedtuple('RowError', ['row', 'message'])
+ImportResult = namedtuple('ImportResult', ['inserted', 'errors', 'error_count', 'budget_ids', 'committed'])
+
+
+class PaymentImportError(Exception):
+    """ファイル全体を取り込めない（形式・見出しの不備など）"""
+
+
+def read_rows(stream, filename, encoding='utf-8-sig'):
+    """CSV/XLSX のファイルを1行ずつ (行番号, 値のリスト) として読み出す"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'csv':
+        return _read_csv_rows(stream, encoding)
+    if extension == 'xlsx':
+        return _read_xlsx_rows(stream)
+    raise PaymentImportError('CSV（.csv）または Excel（.xlsx）のファイルを指定してください')
+
+
+def _read_csv_rows(stream, encoding):
+    text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+    try:
+        for row_number, values in enumerate(csv.reader(text), start=1):
+            yield row_number, values
+    except UnicodeDecodeError:
+        raise PaymentImportError(f'文字コード {encoding} として読み込めません')
+    finally:
+        text.detach()
+
+
+def _read_xlsx_rows(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise PaymentImportError('Excel ファイルの取り込みには openpyxl が必要です')
+
+    # read_only で開き、行を順に読み出してシート全体をメモリに展開しない
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise PaymentImportError(f'Excel ファイルを開けません: {e}')
+    try:
+        for row_number, values in enumerate(workbook.active.iter_rows(values_only=True), start=1):
+            yield row_number, list(values)
+    finally:
+        workbook.close()
+
+
+def _header_fields(values):
+    """見出し行の列位置と項目の対応"""
+    fields = {}
+    for index, value in enumerate(values):
+        field = HEADER_ALIASES.get(str(value).strip().lower() if value is not None else '')
+        if field is not None and field not in fields:
+            fields[field] = index
+    missing = [label for name, label in REQUIRED_FIELDS.items() if name not in fields]
+    if missing:
+        raise PaymentImportError(f'見出しに必要な列がありません: {", ".join(missing)}')
+    return fields
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _integer(value, label):
+    if isinstance(value, bool):
+        raise ValueError(f'{label}が数値ではありません')
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    text = _text(value).replace(',', '').removesuffix('円')
+    try:
+        return int(text)
+    except ValueError:
+        raise ValueError(f'{label}が整数ではありません: {_text(value) or "（空欄）"}')
+
+
+def _parse_row(values, fields, budgets_by_code, now):
+    """1行を検証し、挿入する値の辞書にする。不備があればValueError"""
+    def value(field):
+        index = fields.get(field)
+        return values[index] if index is not None and index < len(values) else None
+
+    code = _text(value('code'))
+    if code not in CONSTRUCTION_TYPES:
+        raise ValueError(f'工種コードが正しくありません: {code or "（空欄）"}')
+    budgets = budgets_by_code.get(code)
+    if not budgets:
+        raise ValueError(f'工種コード {code} の工種がこの物件に登録されていません')
+    if len(budgets) > 1:
+        raise ValueError(f'工種コード {code} の工種がこの物件に複数登録されています')
+
+    year = _integer(value('year'), '年')
+    if not 2000 <= year <= 2100:
+        raise ValueError(f'年が範囲外です: {year}')
+    month = _integer(value('month'), '月')
+    if not 1 <= month <= 12:
+        raise ValueError(f'月が範囲外です: {month}')
+
+    vendor_name = _text(value('vendor_name'))
+    if not vendor_name:
+        raise ValueError('業者名が空欄です')
+    if len(vendor_name) > 200:
+        raise ValueError('業者名が長すぎます（200文字まで）')
+
+    amount = _integer(value('amount'), '金額')
+    if not -2 ** 31 < amount < 2 ** 31:
+        raise ValueError(f'金額が範囲外です: {amount}')
+
+    kind = _text(value('kind'))
+    if kind not in KINDS:
+        raise ValueError(f'区分は「請負」または「請負外」を指定してください: {kind or "（空欄）"}')
+
+    return {
+        'year': year,
+        'month': month,
+        'vendor_name': vendor_name,
+        'amount': amount,
+        'is_contract': KINDS[kind],
+        'payment_type': kind,
+        'note': _text(value('note')) or None,
+        'construction_budget_id': budgets[0].id,
+        'created_at': now,
+        'updated_at': now,
+    }
+
+
+def _insert_batch(batch):
+    """支払いをまとめて挿入する（PostgreSQL/psycopg2 は COPY、それ以外は executemany）"""
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql' and connection.dialect.driver == 'psycopg2':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows([row[column] for column in INSERT_COLUMNS] for row in batch)
+        buffer.seek(0)
+        # セッションと同じ接続・トランザクションで実行する（空欄は NULL になる）
+        with connection.connection.dbapi_connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY payment ({", ".join(INSERT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)', buffer)
+    else:
+        db.session.execute(insert(Payment), batch)
+
+
+def import_payments(property_id, rows, skip_invalid=False, batch_size=1000):
+    """物件の支払いを1トランザクションで一括登録する
+
+    rows は read_rows の戻り値（1行目は見出し）。行を読みながら batch_size 件ずつ挿入し、
+    工種の支払集計も同じトランザクションで更新する。
+    不備のある行が1件でもあればすべて取り消す（skip_invalid の場合は不備のある行のみ除いて登録する）。
+    """
+    rows = iter(rows)
+    try:
+        _, header = next(rows)
+    except StopIteration:
+        raise PaymentImportError('ファイルが空です')
+    fields = _header_fields(header)
+
+    # 物件の工種を1回で取得し、工種コードから引けるようにする
+    budgets_by_code = {}
+    for budget in ConstructionBudget.query.filter_by(property_id=property_id).order_by(ConstructionBudget.id):
+        budgets_by_code.setdefault(budget.code, []).append(budget)
+    budgets_by_id = {budget.id: budget for budgets in budgets_by_code.values() for budget in budgets}
+
+    now = datetime.utcnow()
+    errors = []
+    error_count = 0
+    inserted = 0
+    totals = {}
+    batch = []
+    try:
+        for row_number, values in rows:
+            if all(_text(value) == '' for value in values):
+                continue
+            try:
+                payment = _parse_row(values, fields, budgets_by_code, now)
+            except ValueError as e:
+                error_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(RowError(row_number, str(e)))
+                continue
+
+            budget_totals = totals.setdefault(payment['construction_budget_id'], dict.fromkeys(SUMMARY_COLUMNS, 0))
+            budget_totals[summary_column(payment['is_contract'], payment['note'])] += payment['amount']
+            # 不備がある時点ですべて取り消すため、以降の行は検証のみ行う
+            if error_count and not skip_invalid:
+                continue
+            batch.append(payment)
+            if len(batch) >= batch_size:
+                _insert_batch(batch)
+                inserted += len(batch)
+                batch = []
+
+        if error_count and not skip_invalid:
+            db.session.rollback()
+            return ImportResult(0, errors, error_count, [], False)
+
+        if batch:
+            _insert_batch(batch)
+            inserted += len(batch)
+        for budget_id, budget_totals in totals.items():
+            update_budget_totals(budgets_by_id[budget_id], after=budget_totals)
+        if totals:
+            db.session.get(Property, property_id).bump_version()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return ImportResult(inserted, errors, error_count, sorted(totals), True)
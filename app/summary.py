@@ -0,0 +1,428 @@
+from collections import namedtuple
+from datetime import datetime
+from itertools import groupby
+from operator import attrgetter
+
+from sqlalchemy import and_, case, func, or_, tuple_, update
+
+from app.extensions import db
+from app.models import ConstructionBudget, Payment, Property
+
+# 出来高支払として扱う備考
+PROGRESS_NOTE = '出来高支払'
+
+
+# 工種に保持する支払集計の列
+SUMMARY_COLUMNS = ('contract_total', 'progress_total', 'non_contract_total')
+
+
+class BudgetSummary(namedtuple('BudgetSummary', [
+    'budget', 'contract_total', 'progress_total', 'non_contract_total'
+])):
+    """工種ごとの支払集計"""
+    __slots__ = ()
+
+    @classmethod
+    def from_budget(cls, budget):
+        """工種の集計列から作成する"""
+        return cls(budget, budget.contract_total, budget.progress_total, budget.non_contract_total)
+
+    @property
+    def total_paid(self):
+        """総支払額"""
+        return self.contract_total + self.progress_total + self.non_contract_total
+
+    @property
+    def contract_remaining(self):
+        """請負残額（予算額から出来高支払い合計を引いた額）"""
+        return self.budget.amount - self.progress_total
+
+
+class PropertyRollup(namedtuple('PropertyRollup', ['property', 'budget_total', 'paid_total'])):
+    """物件ごとの工種予算・支払の合計"""
+    __slots__ = ()
+
+    @property
+    def remaining(self):
+        """残額（工種予算合計から支払済額を引いた額）"""
+        return self.budget_total - self.paid_total
+
+    @property
+    def is_overrun(self):
+        """支払済額が工種予算合計を超えているか"""
+        return self.paid_total > self.budget_total
+
+
+class CashFlowCell(namedtuple('CashFlowCell', ['contract', 'progress', 'non_contract', 'total'])):
+    """年月ごとの支払額（請負・出来高・請負外とその合計）"""
+    __slots__ = ()
+
+    @classmethod
+    def from_amounts(cls, contract, progress, non_contract):
+        return cls(contract, progress, non_contract, contract + progress + non_contract)
+
+    def __add__(self, other):
+        return CashFlowCell(*(a + b for a, b in zip(self, other)))
+
+
+EMPTY_CASH_FLOW_CELL = CashFlowCell(0, 0, 0, 0)
+
+# 工種ごとの行（cells は periods と同じ順、total は全期間の合計）
+CashFlowRow = namedtuple('CashFlowRow', ['code', 'name', 'cells', 'total'])
+
+# 物件の資金繰り表（periods は (年, 月) の昇順、period_totals/cumulative_totals は期間ごとの月計・累計）
+CashFlow = namedtuple('CashFlow', ['periods', 'rows', 'period_totals', 'cumulative_totals', 'grand_total'])
+
+
+# 業者ごとの支払い履歴（payments は年月順、続きがある場合は next_cursor を持つ）
+VendorHistory = namedtuple('VendorHistory', ['name', 'total', 'payments', 'next_cursor'])
+
+# 工種ごとの業者別支払い（各要素は VendorHistory）
+VendorGroups = namedtuple('VendorGroups', ['contract_vendors', 'progress_vendors'])
+EMPTY_VENDOR_GROUPS = VendorGroups([], [])
+
+
+def _sum_where(condition):
+    return func.coalesce(func.sum(case((condition, Payment.amount), else_=0)), 0)
+
+
+def is_progress_payment():
+    """出来高支払の条件式"""
+    return and_(Payment.is_contract.is_(True), Payment.note == PROGRESS_NOTE)
+
+
+def is_contract_payment():
+    """請負支払（出来高支払を除く）の条件式"""
+    return and_(
+        Payment.is_contract.is_(True),
+        or_(Payment.note.is_(None), Payment.note != PROGRESS_NOTE)
+    )
+
+
+def is_non_contract_payment():
+    """請負外支払の条件式"""
+    return Payment.is_contract.is_(False)
+
+
+def get_budget_summaries(property_id):
+    """物件の全工種の支払集計を取得する（集計列を読むだけで支払いは走査しない）"""
+    budgets = ConstructionBudget.query.filter_by(
+        property_id=property_id
+    ).order_by(
+        ConstructionBudget.id
+    ).all()
+
+    return [BudgetSummary.from_budget(budget) for budget in budgets]
+
+
+def get_property_rollups(user_id):
+    """ユーザーの全物件の工種予算・支払合計を1回のGROUP BYで取得する
+
+    支払額は工種の集計列を合計するため、支払いの件数によらず工種数に比例する。
+    """
+    paid = sum(getattr(ConstructionBudget, column) for column in SUMMARY_COLUMNS)
+    rows = db.session.query(
+        Property,
+        func.coalesce(func.sum(ConstructionBudget.amount), 0),
+        func.coalesce(func.sum(paid), 0),
+    ).outerjoin(
+        ConstructionBudget, ConstructionBudget.property_id == Property.id
+    ).filter(
+        Property.user_id == user_id
+    ).group_by(
+        Property.id
+    ).order_by(
+        Property.id
+    ).all()
+
+    return [PropertyRollup(*row) for row in rows]
+
+
+def summary_column(is_contract, note):
+    """支払いの金額を加算する集計列"""
+    if not is_contract:
+        return 'non_contract_total'
+    if note == PROGRESS_NOTE:
+        return 'progress_total'
+    return 'contract_total'
+
+
+def payment_totals(payment):
+    """1件の支払いが集計列のどれにいくら寄与するか"""
+    totals = dict.fromkeys(SUMMARY_COLUMNS, 0)
+    totals[summary_column(payment.is_contract, payment.note)] = payment.amount
+    return totals
+
+
+def vendor_totals(budget_id, vendor_name):
+    """工種内の1業者の支払いが集計列のどれにいくら寄与するか"""
+    row = db.session.query(
+        _sum_where(is_contract_payment()),
+        _sum_where(is_progress_payment()),
+        _sum_where(is_non_contract_payment()),
+    ).filter(
+        Payment.construction_budget_id == budget_id,
+        Payment.vendor_name == vendor_name
+    ).one()
+    return dict(zip(SUMMARY_COLUMNS, row))
+
+
+def update_budget_totals(budget, before=None, after=None):
+    """工種の集計列から before を差し引き after を加える
+
+    呼び出し元のトランザクション内で「列 = 列 + 差分」として更新するため、
+    同じ工種への同時更新があっても加算が失われない。
+    集計が変わらない場合も updated_at を更新し、フラグメントキャッシュを無効にする。
+    """
+    before = before or {}
+    after = after or {}
+    for column in SUMMARY_COLUMNS:
+        delta = after.get(column, 0) - before.get(column, 0)
+        if delta:
+            setattr(budget, column, getattr(ConstructionBudget, column) + delta)
+    budget.updated_at = datetime.utcnow()
+
+
+def compute_budget_totals(budget_ids):
+    """支払いから工種の集計を1回のGROUP BYで計算する（集計列の再構築用）"""
+    rows = db.session.query(
+        ConstructionBudget.id,
+        _sum_where(is_contract_payment()),
+        _sum_where(is_progress_payment()),
+        _sum_where(is_non_contract_payment()),
+    ).outerjoin(
+        Payment, Payment.construction_budget_id == ConstructionBudget.id
+    ).filter(
+        ConstructionBudget.id.in_(budget_ids)
+    ).group_by(
+        ConstructionBudget.id
+    ).all()
+    return {budget_id: dict(zip(SUMMARY_COLUMNS, totals)) for budget_id, *totals in rows}
+
+
+def rebuild_budget_totals(batch_size=500):
+    """全工種の集計列を支払いから再計算する。batch_size 件ごとにコミットし、修正した工種の件数を返す
+
+    集計が保存値と異なる工種だけを更新し、同じバッチで updated_at（フラグメントキャッシュのマーカー）と
+    その物件の版数（ETag）も更新して、修正前の集計を表示したページ・カードを無効にする。
+    """
+    corrected = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(
+            ConstructionBudget.id,
+            ConstructionBudget.property_id,
+            *(getattr(ConstructionBudget, column) for column in SUMMARY_COLUMNS)
+        ).filter(
+            ConstructionBudget.id > last_id
+        ).order_by(
+            ConstructionBudget.id
+        ).limit(batch_size).all()
+        if not rows:
+            break
+
+        totals = compute_budget_totals([row.id for row in rows])
+        changed = [
+            row for row in rows
+            if tuple(row[2:]) != tuple(totals[row.id][column] for column in SUMMARY_COLUMNS)
+        ]
+        if changed:
+            now = datetime.utcnow()
+            db.session.execute(
+                update(ConstructionBudget),
+                [{'id': row.id, 'updated_at': now, **totals[row.id]} for row in changed]
+            )
+            db.session.execute(
+                update(Property).where(
+                    Property.id.in_({row.property_id for row in changed})
+                ).values(version=Property.version + 1)
+            )
+        db.session.commit()
+        corrected += len(changed)
+        last_id = rows[-1].id
+    return corrected
+
+
+def get_cash_flow(property_id):
+    """物件の工種×年月の支払額（請負・出来高・請負外）と月計・累計
+
+    (工種, 年, 月) ごとの合計を1回のGROUP BYで取得し、整数の (年, 月) をキーに表へ並べる。
+    支払いのない工種も空の行として含める。
+    """
+    rows = db.session.query(
+        ConstructionBudget.id,
+        ConstructionBudget.code,
+        ConstructionBudget.name,
+        Payment.year,
+        Payment.month,
+        _sum_where(is_contract_payment()),
+        _sum_where(is_progress_payment()),
+        _sum_where(is_non_contract_payment()),
+    ).outerjoin(
+        Payment, Payment.construction_budget_id == ConstructionBudget.id
+    ).filter(
+        ConstructionBudget.property_id == property_id
+    ).group_by(
+        ConstructionBudget.id, ConstructionBudget.code, ConstructionBudget.name, Payment.year, Payment.month
+    ).order_by(
+        ConstructionBudget.code, ConstructionBudget.id
+    ).all()
+
+    budgets = {}
+    periods = set()
+    for budget_id, code, name, year, month, *amounts in rows:
+        cells = budgets.setdefault(budget_id, (code, name, {}))[2]
+        if year is not None:
+            cells[year, month] = CashFlowCell.from_amounts(*amounts)
+            periods.add((year, month))
+    periods = sorted(periods)
+
+    cash_flow_rows = []
+    period_totals = [EMPTY_CASH_FLOW_CELL] * len(periods)
+    for code, name, cells in budgets.values():
+        row_cells = [cells.get(period, EMPTY_CASH_FLOW_CELL) for period in periods]
+        period_totals = [total + cell for total, cell in zip(period_totals, row_cells)]
+        cash_flow_rows.append(CashFlowRow(code, name, row_cells, sum(cells.values(), EMPTY_CASH_FLOW_CELL)))
+
+    cumulative_totals = []
+    running = EMPTY_CASH_FLOW_CELL
+    for total in period_totals:
+        running += total
+        cumulative_totals.append(running)
+
+    return CashFlow(periods, cash_flow_rows, period_totals, cumulative_totals, running)
+
+
+def get_vendor_groups(property_id, budget_ids=None):
+    """物件の全支払いを(工種, 業者, 年, 月)順に1回で取得し、工種ごとの業者グループに分割する
+
+    budget_ids を指定した場合はその工種の支払いのみを取得する。
+    """
+    payments = Payment.query.join(
+        ConstructionBudget, Payment.construction_budget_id == ConstructionBudget.id
+    ).filter(
+        ConstructionBudget.property_id == property_id
+    )
+    if budget_ids is not None:
+        payments = payments.filter(Payment.construction_budget_id.in_(budget_ids))
+    payments = payments.order_by(
+        Payment.construction_budget_id,
+        Payment.vendor_name,
+        Payment.year,
+        Payment.month,
+        Payment.id
+    )
+
+    # 並び順が保証されているため、ソートや辞書の組み立てなしに1パスで分割できる
+    vendor_groups = {}
+    for budget_id, budget_payments in groupby(payments, key=attrgetter('construction_budget_id')):
+        contract_vendors = []
+        progress_vendors = []
+        for vendor_name, vendor_payments in groupby(budget_payments, key=attrgetter('vendor_name')):
+            contract = []
+            progress = []
+            for payment in vendor_payments:
+                if not payment.is_contract:
+                    continue
+                if payment.note == PROGRESS_NOTE:
+                    progress.append(payment)
+                else:
+                    contract.append(payment)
+            if contract:
+                contract_vendors.append(VendorHistory(vendor_name, sum(p.amount for p in contract), contract, None))
+            if progress:
+                progress_vendors.append(VendorHistory(vendor_name, sum(p.amount for p in progress), progress, None))
+        vendor_groups[budget_id] = VendorGroups(contract_vendors, progress_vendors)
+    return vendor_groups
+
+
+def encode_cursor(payment):
+    """支払い履歴のページ位置（年・月・ID）を文字列にする"""
+    return f'{payment.year}-{payment.month}-{payment.id}'
+
+
+def decode_cursor(cursor):
+    """encode_cursor の逆変換。不正な値の場合はValueError"""
+    year, month, payment_id = (int(part) for part in cursor.split('-'))
+    return year, month, payment_id
+
+
+def _vendor_payments_query(budget_id, progress):
+    return Payment.query.filter(
+        Payment.construction_budget_id == budget_id,
+        is_progress_payment() if progress else is_contract_payment()
+    )
+
+
+def _history_order():
+    return (Payment.year, Payment.month, Payment.id)
+
+
+def get_vendor_histories(budget_id, limit):
+    """工種の業者別合計と、業者ごとの支払い履歴の先頭 limit 件を取得する"""
+    totals = db.session.query(
+        Payment.vendor_name,
+        _sum_where(is_contract_payment()).label('contract_total'),
+        func.sum(case((is_contract_payment(), 1), else_=0)).label('contract_count'),
+        _sum_where(is_progress_payment()).label('progress_total'),
+        func.sum(case((is_progress_payment(), 1), else_=0)).label('progress_count'),
+    ).filter(
+        Payment.construction_budget_id == budget_id,
+        Payment.is_contract.is_(True)
+    ).group_by(
+        Payment.vendor_name
+    ).order_by(
+        Payment.vendor_name
+    ).all()
+
+    # 業者・区分ごとの先頭 limit 件をウィンドウ関数で1回に取得する
+    kind = case((is_progress_payment(), 1), else_=0)
+    ranked = db.session.query(
+        Payment.id.label('id'),
+        kind.label('is_progress'),
+        func.row_number().over(
+            partition_by=(Payment.vendor_name, kind),
+            order_by=_history_order()
+        ).label('row_number')
+    ).filter(
+        Payment.construction_budget_id == budget_id,
+        Payment.is_contract.is_(True)
+    ).subquery()
+    rows = db.session.query(Payment, ranked.c.is_progress).join(
+        ranked, ranked.c.id == Payment.id
+    ).filter(
+        ranked.c.row_number <= limit
+    ).order_by(
+        Payment.vendor_name, *_history_order()
+    ).all()
+
+    first_pages = {}
+    for payment, progress in rows:
+        first_pages.setdefault((payment.vendor_name, bool(progress)), []).append(payment)
+
+    contract_vendors = []
+    progress_vendors = []
+    for vendor_name, contract_total, contract_count, progress_total, progress_count in totals:
+        for progress, total, count, vendors in (
+            (False, contract_total, contract_count, contract_vendors),
+            (True, progress_total, progress_count, progress_vendors),
+        ):
+            if not count:
+                continue
+            payments = first_pages.get((vendor_name, progress), [])
+            next_cursor = encode_cursor(payments[-1]) if payments and count > len(payments) else None
+            vendors.append(VendorHistory(vendor_name, total, payments, next_cursor))
+    return VendorGroups(contract_vendors, progress_vendors)
+
+
+def get_vendor_payment_page(budget_id, vendor_name, progress, after, limit):
+    """業者の支払い履歴を after の次から limit 件取得する（キーセットページング）"""
+    payments = _vendor_payments_query(budget_id, progress).filter(
+        Payment.vendor_name == vendor_name,
+        tuple_(*_history_order()) > tuple_(*after)
+    ).order_by(
+        *_history_order()
+    ).limit(limit + 1).all()
+
+    next_cursor = encode_cursor(payments[limit - 1]) if len(payments) > limit else None
+    return payments[:limit], next_cursor
@@ -0,0 +1,128 @@
+"""ベンチマーク共通の準備処理（一時データベースとベンチマーク用データの作成）
+
+app は DATABASE_URL を読んでアプリを作成するため、use_database() は app のインポートより前に呼ぶ。
+スキーマは本番と同じくマイグレーションで作成する。
+
+    from _common import use_database, remove_database, create_schema, seed_user, seed_property
+    use_database()
+    from app import app
+    try:
+        with app.app_context():
+            create_schema()
+            ...
+    finally:
+        remove_database()
+"""
+import logging
+import os
+import random
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS_DIR = os.path.join(ROOT, 'migrations')
+
+sys.path.insert(0, ROOT)
+
+# 支払いの種類ごとの (is_contract, note)
+PAYMENT_KINDS = [(True, None), (True, '出来高支払'), (False, None)]
+
+_db_file_name = None
+
+
+def use_database(database_url=None, log_level=logging.INFO):
+    """DATABASE_URL を設定し（既定: 一時SQLite）、log_level 以下のログを出さないようにする"""
+    global _db_file_name
+    if database_url:
+        os.environ['DATABASE_URL'] = database_url
+    else:
+        db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        db_file.close()
+        _db_file_name = db_file.name
+        os.environ['DATABASE_URL'] = f'sqlite:///{_db_file_name}'
+    logging.disable(log_level)
+
+
+def remove_database():
+    """use_database で作成した一時SQLiteを削除する"""
+    global _db_file_name
+    if _db_file_name is not None:
+        os.unlink(_db_file_name)
+        _db_file_name = None
+
+
+def create_schema():
+    """マイグレーションでスキーマを作成する（アプリケーションコンテキスト内で呼ぶ）"""
+    from flask_migrate import upgrade
+
+    upgrade(directory=MIGRATIONS_DIR)
+
+
+def seed_user(username='bench', password=None):
+    """ユーザーを作成する（password を省略した場合はログインできないユーザー）"""
+    from app.extensions import db
+    from app.models import User
+
+    user = User(username=username, email=f'{username}@example.com', password_hash='')
+    if password is not None:
+        user.set_password(password)
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def seed_property(user, code='BENCH', budget_count=20, name='ベンチマーク物件'):
+    """物件と budget_count 件の工種（工種コードは CONSTRUCTION_TYPES を順に使う）を作成し、(物件, 工種のリスト) を返す"""
+    from app import CONSTRUCTION_TYPES
+    from app.extensions import db
+    from app.models import Property, ConstructionBudget
+
+    property = Property(code=code, name=name, contract_amount=10 ** 9, budget_amount=9 * 10 ** 8, user_id=user.id)
+    db.session.add(property)
+    db.session.flush()
+
+    codes = list(CONSTRUCTION_TYPES.items())
+    budgets = [
+        ConstructionBudget(code=codes[i % len(codes)][0], name=codes[i % len(codes)][1],
+                           amount=10 ** 7, property_id=property.id)
+        for i in range(budget_count)
+    ]
+    db.session.add_all(budgets)
+    db.session.flush()
+    return property, budgets
+
+
+def payment_rows(budget_ids, count, rnd=None, vendor_count=8):
+    """支払いの行（insert(Payment) に渡す辞書）を count 件作る
+
+    工種は budget_ids を順に割り当て、請負・出来高・請負外を同じ割合で混ぜる。
+    """
+    rnd = rnd or random.Random(0)
+    rows = []
+    for i in range(count):
+        is_contract, note = rnd.choice(PAYMENT_KINDS)
+        rows.append({
+            'year': rnd.randint(2021, 2025),
+            'month': rnd.randint(1, 12),
+            'vendor_name': f'業者{rnd.randint(1, vendor_count)}',
+            'amount': rnd.randint(1, 500) * 1000,
+            'is_contract': is_contract,
+            'payment_type': '請負',
+            'note': note,
+            'construction_budget_id': budget_ids[i % len(budget_ids)],
+        })
+    return rows
+
+
+def insert_payments(rows):
+    """支払いを一括挿入してコミットし、工種の支払集計を再計算する"""
+    from sqlalchemy import insert
+
+    from app.extensions import db
+    from app.models import Payment
+    from app.summary import rebuild_budget_totals
+
+    db.session.execute(insert(Payment), rows)
+    db.session.commit()
+    # 支払いを直接登録したため工種の支払集計を再計算する
+    rebuild_budget_totals()
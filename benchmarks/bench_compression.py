@@ -0,0 +1,87 @@
+"""レスポンス圧縮のベンチマーク
+
+工種数を変えた物件の property_detail（HTML）と工種一覧 API（JSON）の実際のレスポンスについて、
+圧縮方式・レベルごとの転送バイト数と、1レスポンスあたりの圧縮CPU時間を計測する。
+brotli はインストールされている場合のみ計測する。
+
+    python benchmarks/bench_compression.py [--budgets 5 20 60 150] [--payments-per-budget 20] [--repeat 20]
+"""
+import argparse
+import logging
+import os
+import time
+
+from _common import use_database, remove_database, create_schema, seed_user, seed_property, payment_rows, insert_payments
+
+use_database(log_level=logging.WARNING)
+os.environ['COMPRESS_ENABLED'] = 'false'
+
+from app import app
+from app.compression import brotli, compress
+
+PASSWORD = 'bench'
+
+# (表示名, 方式, gzip レベル, brotli 品質)
+VARIANTS = [('gzip-1', 'gzip', 1, None), ('gzip-6', 'gzip', 6, None), ('gzip-9', 'gzip', 9, None)]
+if brotli is not None:
+    VARIANTS += [('br-4', 'br', None, 4), ('br-11', 'br', None, 11)]
+
+
+def seed(budget_counts, payments_per_budget):
+    """工種数ごとに物件を作成し、(工種数, 物件ID) を返す"""
+    create_schema()
+    user = seed_user(password=PASSWORD)
+    targets = []
+    rows = []
+    for budget_count in budget_counts:
+        property, budgets = seed_property(user, code=f'BENCH{budget_count}', budget_count=budget_count,
+                                          name=f'ベンチマーク物件{budget_count}')
+        rows += payment_rows([budget.id for budget in budgets], budget_count * payments_per_budget)
+        targets.append((budget_count, property.id))
+    insert_payments(rows)
+    return targets
+
+
+def cpu_ms(data, encoding, level, quality, repeat):
+    """1回の圧縮にかかるCPU時間（ミリ秒、repeat 回の平均）と圧縮後のバイト数"""
+    start = time.process_time()
+    for _ in range(repeat):
+        compressed = compress(data, encoding, gzip_level=level or 6, brotli_quality=quality or 4)
+    return (time.process_time() - start) / repeat * 1000, len(compressed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budgets', type=int, nargs='+', default=[5, 20, 60, 150], help='物件の工種数（複数指定可）')
+    parser.add_argument('--payments-per-budget', type=int, default=20, help='工種あたりの支払い件数')
+    parser.add_argument('--repeat', type=int, default=20, help='圧縮の繰り返し回数')
+    options = parser.parse_args()
+
+    try:
+        with app.app_context():
+            targets = seed(options.budgets, options.payments_per_budget)
+        client = app.test_client()
+        client.post('/login', data={'username': 'bench', 'password': PASSWORD})
+
+        responses = []
+        for budget_count, property_id in targets:
+            responses.append((f'HTML {budget_count}工種', client.get(f'/property/{property_id}').data))
+        for budget_count, property_id in targets:
+            responses.append((f'JSON {budget_count}工種', client.get(f'/api/v1/properties/{property_id}/budgets').data))
+
+        print(f'{"レスポンス":<16}{"元(KB)":>9}', end='')
+        for label, *_ in VARIANTS:
+            print(f'{label + "(KB)":>12}{"ms":>9}', end='')
+        print()
+        for name, data in responses:
+            print(f'{name:<16}{len(data) / 1024:>9.1f}', end='')
+            for _, encoding, level, quality in VARIANTS:
+                elapsed, size = cpu_ms(data, encoding, level, quality, options.repeat)
+                print(f'{size / 1024:>12.1f}{elapsed:>9.2f}', end='')
+            print()
+    finally:
+        remove_database()
+
+
+if __name__ == '__main__':
+    main()
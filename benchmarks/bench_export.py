@@ -0,0 +1,118 @@
+"""物件データ出力のベンチマーク
+
+支払い件数を変えて、ORM で全件を読み込んでから一括生成する方法と、
+サーバー側カーソル（yield_per）から生成しながら送る方法（app.payment_export）の
+出力時間・ピークメモリ（tracemalloc）を比較する。出力は読み捨てる（時間は tracemalloc の計測負荷を含む）。
+
+    python benchmarks/bench_export.py [--payments 10000 50000] [--budgets 50]
+"""
+import argparse
+import csv
+import io
+import time
+import tracemalloc
+
+from _common import use_database, remove_database, create_schema, seed_user, seed_property, payment_rows, insert_payments
+
+use_database()
+
+from openpyxl import Workbook
+from sqlalchemy import delete
+
+from app import app
+from app.extensions import db
+from app.models import ConstructionBudget, Payment
+from app.payment_export import PAYMENT_HEADER, iter_csv, iter_xlsx
+
+
+def seed(budget_count):
+    """ベンチマーク用の物件と工種を作成する"""
+    create_schema()
+    property, budgets = seed_property(seed_user(), budget_count=budget_count)
+    db.session.commit()
+    return property.id, [budget.id for budget in budgets]
+
+
+def fill_payments(budget_ids, payment_count):
+    """物件の支払いを payment_count 件にする"""
+    db.session.execute(delete(Payment))
+    insert_payments(payment_rows(budget_ids, payment_count, vendor_count=30))
+
+
+def eager_csv(property_id):
+    """旧来の方法: ORM で全件読み込み、CSV 全体をメモリ上で作る"""
+    payments = (
+        Payment.query.join(ConstructionBudget)
+        .filter(ConstructionBudget.property_id == property_id)
+        .order_by(ConstructionBudget.code, Payment.year, Payment.month, Payment.id)
+        .all()
+    )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(PAYMENT_HEADER)
+    for payment in payments:
+        budget = payment.construction_budget
+        writer.writerow((budget.code, budget.name, payment.year, payment.month, payment.vendor_name,
+                         payment.amount, payment.payment_type, payment.note or ''))
+    yield buffer.getvalue()
+
+
+def eager_xlsx(property_id):
+    """旧来の方法: ORM で全件読み込み、通常のブックに書き込む"""
+    payments = (
+        Payment.query.join(ConstructionBudget)
+        .filter(ConstructionBudget.property_id == property_id)
+        .order_by(ConstructionBudget.code, Payment.year, Payment.month, Payment.id)
+        .all()
+    )
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(PAYMENT_HEADER)
+    for payment in payments:
+        budget = payment.construction_budget
+        sheet.append((budget.code, budget.name, payment.year, payment.month, payment.vendor_name,
+                      payment.amount, payment.payment_type, payment.note or ''))
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    yield buffer.getvalue()
+
+
+def measure(generate):
+    """出力を読み捨てたときの所要時間・ピークメモリ・出力サイズ"""
+    db.session.expunge_all()
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = sum(len(chunk) for chunk in generate())
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 1024 / 1024, size / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--payments', type=int, nargs='+', default=[10000, 50000], help='支払い件数（複数指定可）')
+    parser.add_argument('--budgets', type=int, default=50, help='工種数')
+    options = parser.parse_args()
+
+    variants = [
+        ('CSV 一括', lambda pid: eager_csv(pid)),
+        ('CSV ストリーム', lambda pid: iter_csv(db.engine, pid, 'payments')),
+        ('XLSX 一括', lambda pid: eager_xlsx(pid)),
+        ('XLSX write_only', lambda pid: iter_xlsx(db.engine, pid)),
+    ]
+    try:
+        with app.app_context():
+            property_id, budget_ids = seed(options.budgets)
+            print(f'{"支払い件数":>10}  {"方式":<18}{"時間(ms)":>10}{"ピーク(MB)":>12}{"出力(MB)":>10}')
+            for payment_count in options.payments:
+                fill_payments(budget_ids, payment_count)
+                for label, generate in variants:
+                    elapsed, peak, size = measure(lambda: generate(property_id))
+                    print(f'{payment_count:>10}  {label:<18}{elapsed:>10.0f}{peak:>12.1f}{size:>10.1f}')
+    finally:
+        remove_database()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""ログインのスループットベンチマーク
+
+同時ログインが集中した状況（ログイン用スレッド --threads 本が --logins 回ずつログイン）で、
+ハッシュ方式・コストと同時に実行する検証の数の上限ごとに
+ログインのスループット、混雑で断った（503）ログイン数、ログインの応答時間、
+同時に処理される軽いリクエストの応答時間を計測する。
+1プロセス内のスレッドでリクエストを処理するため、gthread ワーカー1つ（GUNICORN_THREADS > 1）に相当する。
+
+    python benchmarks/bench_login.py [--threads 16] [--logins 5]
+"""
+import argparse
+import logging
+import os
+import statistics
+import threading
+import time
+
+from _common import use_database, remove_database, create_schema, seed_user
+
+use_database(log_level=logging.WARNING)
+
+from sqlalchemy import update
+
+from app import app
+from app.extensions import db, password_hasher, user_cache
+from app.models import User
+
+PASSWORD = 'bench-password'
+
+# (表示名, ハッシュ方式, 同時に実行する検証の数（0で制限なし）)
+VARIANTS = [
+    ('scrypt 無制限', 'scrypt:32768:8:1', 0),
+    ('scrypt 上限2', 'scrypt:32768:8:1', 2),
+    ('scrypt-16k 上限2', 'scrypt:16384:8:1', 2),
+    ('pbkdf2 上限2', 'pbkdf2:sha256:600000', 2),
+]
+
+
+def configure(method, concurrency):
+    app.config.update(
+        PASSWORD_HASH_METHOD=method,
+        PASSWORD_VERIFY_CONCURRENCY=concurrency
+    )
+    password_hasher.init_app(app)
+
+
+def seed(user_count):
+    """ログインするユーザー bench0, bench1, ... を作成する"""
+    with app.app_context():
+        create_schema()
+        for i in range(user_count):
+            seed_user(f'bench{i}')
+        db.session.commit()
+
+
+def set_passwords(method):
+    """計測中に再ハッシュが起きないよう、指定の方式で全ユーザーのパスワードを保存する"""
+    with app.app_context():
+        password_hash = password_hasher.hash(PASSWORD)
+        assert password_hash.startswith(method)
+        db.session.execute(update(User).values(password_hash=password_hash))
+        db.session.commit()
+
+
+def run_storm(threads, logins):
+    """ログインの集中中に軽いリクエスト（トップページ）を繰り返し、応答時間を記録する"""
+    results = {'ok': 0, 'busy': 0, 'failed': 0}
+    lock = threading.Lock()
+    done = threading.Event()
+    probe_timings = []
+    login_timings = []
+
+    def login_worker(index):
+        client = app.test_client()
+        for _ in range(logins):
+            start = time.perf_counter()
+            response = client.post('/login', data={'username': f'bench{index}', 'password': PASSWORD})
+            login_timings.append(time.perf_counter() - start)
+            if response.status_code == 503:
+                key = 'busy'
+            else:
+                key = 'ok' if response.headers.get('Location', '').endswith('/budgets') else 'failed'
+            with lock:
+                results[key] += 1
+
+    def probe():
+        client = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/')
+            probe_timings.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    workers = [threading.Thread(target=login_worker, args=(i,)) for i in range(threads)]
+    prober = threading.Thread(target=probe)
+    prober.start()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    prober.join()
+
+    return results, elapsed, percentiles(login_timings), percentiles(probe_timings)
+
+
+def percentiles(timings):
+    """中央値と95パーセンタイル（ミリ秒）"""
+    if not timings:
+        return 0, 0
+    timings = sorted(timings)
+    return statistics.median(timings) * 1000, timings[int(len(timings) * 0.95)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16, help='同時にログインするスレッド数')
+    parser.add_argument('--logins', type=int, default=5, help='スレッドあたりのログイン回数')
+    options = parser.parse_args()
+
+    user_cache.maxsize = 0
+    try:
+        seed(options.threads)
+        print(f'同時ログイン: {options.threads} / 1スレッドあたり: {options.logins}回 / CPU数: {os.cpu_count()}')
+        print(f'{"方式":<18}{"成功/秒":>10}{"成功":>6}{"混雑":>6}{"失敗":>6}'
+              f'{"ログインp50":>12}{"ログインp95":>12}{"他p50":>8}{"他p95":>8}  (ms)')
+        for label, method, concurrency in VARIANTS:
+            configure(method, concurrency)
+            set_passwords(method)
+            results, elapsed, (login_p50, login_p95), (probe_p50, probe_p95) = run_storm(options.threads, options.logins)
+            print(f'{label:<18}{results["ok"] / elapsed:>10.1f}{results["ok"]:>6}{results["busy"]:>6}{results["failed"]:>6}'
+                  f'{login_p50:>12.0f}{login_p95:>12.0f}{probe_p50:>8.1f}{probe_p95:>8.1f}')
+    finally:
+        remove_database()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,698 @@
+"""property_detail の描画ベンチマーク
+
+旧実装（f-string連結）と Jinja テンプレート（フラグメントキャッシュの有無）の
+描画時間・ピークメモリを比較する。
+100工種・5,000支払いの物件を一時SQLiteに作成し、データ取得後の描画部分のみを計測する。
+
+    python benchmarks/bench_property_detail.py [--budgets 100] [--payments 5000] [--repeat 5]
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime
+
+from _common import use_database, remove_database, create_schema, seed_user, seed_property, payment_rows, insert_payments
+
+use_database()
+
+from flask import get_template_attribute, render_template
+
+from app import app, CONSTRUCTION_TYPES, property_page_context, render_budget_cards
+from app.summary import EMPTY_VENDOR_GROUPS, get_budget_summaries, get_vendor_groups
+
+
+def seed(budget_count, payment_count):
+    """ベンチマーク用の物件・工種・支払いを作成する"""
+    create_schema()
+    property, budgets = seed_property(seed_user(password='bench'), budget_count=budget_count)
+    insert_payments(payment_rows([budget.id for budget in budgets], payment_count))
+    return property
+
+
+def render_fstring(property, summaries, vendor_groups_by_budget):
+    """旧実装の f-string 連結による描画（請負業者カードの追加漏れのみ修正）"""
+    # 工種リストのHTML生成
+    budgets_html = ''
+    total_amount = 0
+    for summary in summaries:
+        budget = summary.budget
+        total_amount += budget.amount
+    
+        # 業者別の支払い（業者名・年月順に整列済み）
+        vendor_groups = vendor_groups_by_budget.get(budget.id, EMPTY_VENDOR_GROUPS)
+    
+        # 請負支払いの合計
+        contract_total = summary.contract_total
+        # 出来高支払いの合計
+        progress_total = summary.progress_total
+        # 請負外支払いの合計
+        non_contract_total = summary.non_contract_total
+        # 請負残額（予算額から出来高支払い合計を引いた額）
+        contract_remaining = summary.contract_remaining
+
+        # HTML変数の初期化
+        contract_payments_html = ''
+        progress_payments_html = ''
+        non_contract_payments_html = ''
+
+        # 年月の選択肢を生成（条件分岐の前に移動）
+        current_year = datetime.now().year
+        current_month = datetime.now().month
+        year_options = [f'<option value="{year}" {"selected" if year == current_year else ""}>{year}年</option>' for year in range(2020, current_year + 2)]
+        month_options = [f'<option value="{month}" {"selected" if month == current_month else ""}>{month}月</option>' for month in range(1, 13)]
+
+        # 請負支払いの処理
+        if vendor_groups.contract_vendors:
+            # 業者ごとのHTML生成
+            vendor_cards = []
+        
+            for vendor_name, _, vendor_payments, _ in vendor_groups.contract_vendors:
+                # 業者ごとの支払い合計と残額を計算
+                vendor_total = sum(p.amount for p in vendor_payments)
+                vendor_remaining = vendor_total - progress_total  # 請負額から出来高支払い合計を引いた額
+                remaining_style = 'color: red;' if vendor_remaining < 0 else ''
+                warning_message = '<div class="text-danger">※請負額を超過しています</div>' if vendor_remaining < 0 else ''
+            
+                # 支払い履歴の行を生成
+                payment_rows = []
+                for p in vendor_payments:
+                    payment_rows.append(
+                        f'''<tr>
+                            <td>{p.year}年{p.month}月</td>
+                            <td>{p.amount:,}円</td>
+                            <td>{p.note or ""}</td>
+                            <td>
+                                <div class="btn-group" role="group">
+                                    <button type="button" class="btn btn-sm btn-warning" data-bs-toggle="modal" data-bs-target="#editPaymentModal{p.id}">編集</button>
+                                    <button type="button" class="btn btn-sm btn-danger" data-bs-toggle="modal" data-bs-target="#deletePaymentModal{p.id}">削除</button>
+                                </div>
+                            </td>
+                        </tr>'''
+                    )
+
+                    # 支払い編集モーダル
+                    payment_rows.append(f'''
+                    <div class="modal fade" id="editPaymentModal{p.id}" tabindex="-1">
+                        <div class="modal-dialog">
+                            <div class="modal-content">
+                                <div class="modal-header">
+                                    <h5 class="modal-title">支払い編集</h5>
+                                    <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
+                                </div>
+                                <div class="modal-body">
+                                    <form action="/payment/{p.id}/edit" method="POST">
+                                        <div class="row mb-3">
+                                            <div class="col">
+                                                <label for="payment_year" class="form-label">年</label>
+                                                <select class="form-select" id="payment_year" name="payment_year" required>
+                                                    {''.join([f'<option value="{year}" {"selected" if year == p.year else ""}>{year}年</option>' for year in range(2020, datetime.now().year + 2)])}
+                                                </select>
+                                            </div>
+                                            <div class="col">
+                                                <label for="payment_month" class="form-label">月</label>
+                                                <select class="form-select" id="payment_month" name="payment_month" required>
+                                                    {''.join([f'<option value="{month}" {"selected" if month == p.month else ""}>{month}月</option>' for month in range(1, 13)])}
+                                                </select>
+                                            </div>
+                                        </div>
+                                        <div class="mb-3">
+                                            <label for="payment_amount" class="form-label">支払い金額</label>
+                                            <input type="number" class="form-control" id="payment_amount" name="payment_amount" value="{p.amount}" required>
+                                        </div>
+                                        <div class="mb-3">
+                                            <label for="payment_note" class="form-label">備考</label>
+                                            <textarea class="form-control" id="payment_note" name="payment_note" rows="3">{p.note or ""}</textarea>
+                                        </div>
+                                        <div class="text-end">
+                                            <button type="submit" class="btn btn-primary">更新</button>
+                                        </div>
+                                    </form>
+                                </div>
+                            </div>
+                        </div>
+                    </div>
+
+                    <!-- 支払い削除確認モーダル -->
+                    <div class="modal fade" id="deletePaymentModal{p.id}" tabindex="-1">
+                        <div class="modal-dialog">
+                            <div class="modal-content">
+                                <div class="modal-header">
+                                    <h5 class="modal-title">支払い削除の確認</h5>
+                                    <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
+                                </div>
+                                <div class="modal-body">
+                                    <p>{p.year}年{p.month}月の支払い（{p.amount:,}円）を削除してもよろしいですか？</p>
+                                    <p class="text-danger">この操作は取り消せません。</p>
+                                </div>
+                                <div class="modal-footer">
+                                    <form action="/payment/{p.id}/delete" method="POST">
+                                        <button type="button" class="btn btn-secondary" data-bs-dismiss="modal">キャンセル</button>
+                                        <button type="submit" class="btn btn-danger">削除</button>
+                                    </form>
+                                </div>
+                            </div>
+                        </div>
+                    </div>
+                    ''')
+            
+                # 業者カードを生成
+                vendor_card = f'''
+                <div class="card mb-3">
+                    <div class="card-header d-flex justify-content-between align-items-center">
+                        <div>
+                            <span class="fw-bold">{vendor_name}</span>
+                            <span class="ms-3 text-muted">請負額: {vendor_total:,}円</span>
+                        </div>
+                        <div class="btn-group" role="group">
+                            <button type="button" class="btn btn-sm btn-success" data-bs-toggle="modal" data-bs-target="#progressPaymentModal{budget.id}_{vendor_name.replace(" ", "_")}">出来高払い</button>
+                            <button type="button" class="btn btn-sm btn-warning" data-bs-toggle="modal" data-bs-target="#editVendorModal{budget.id}_{vendor_name.replace(" ", "_")}">編集</button>
+                            <button type="button" class="btn btn-sm btn-danger" data-bs-toggle="modal" data-bs-target="#deleteVendorModal{budget.id}_{vendor_name.replace(" ", "_")}">削除</button>
+                        </div>
+                    </div>
+                    <div class="card-body p-0">
+                        <table class="table table-sm mb-0">
+                            <thead>
+                                <tr>
+                                    <th>登録年月</th>
+                                    <th>出来高支払額</th>
+                                    <th>備考</th>
+                                    <th>操作</th>
+                                </tr>
+                            </thead>
+                            <tbody>
+                                {''.join(payment_rows)}
+                                <tr class="table-info">
+                                    <td class="text-end">支払残額</td>
+                                    <td style="{remaining_style}">{vendor_remaining:,}円</td>
+                                    <td colspan="2">{warning_message}</td>
+                                </tr>
+                            </tbody>
+                        </table>
+                    </div>
+                </div>
+
+                <!-- 出来高支払いモーダル -->
+                <div class="modal fade" id="progressPaymentModal{budget.id}_{vendor_name.replace(" ", "_")}" tabindex="-1">
+                    <div class="modal-dialog">
+                        <div class="modal-content">
+                            <div class="modal-header">
+                                <h5 class="modal-title">出来高支払い入力</h5>
+                                <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
+                            </div>
+                            <div class="modal-body">
+                                <form action="/budget/{budget.id}/payment/add" method="POST">
+                                    <div class="row mb-3">
+                                        <div class="col">
+                                            <label for="payment_year" class="form-label">年</label>
+                                            <select class="form-select" id="payment_year" name="payment_year" required>
+                                                {''.join(year_options)}
+                                            </select>
+                                        </div>
+                                        <div class="col">
+                                            <label for="payment_month" class="form-label">月</label>
+                                            <select class="form-select" id="payment_month" name="payment_month" required>
+                                                {''.join(month_options)}
+                                            </select>
+                                        </div>
+                                    </div>
+                                    <div class="mb-3">
+                                        <label for="payment_amount" class="form-label">出来高支払額</label>
+                                        <input type="number" class="form-control" id="payment_amount" name="payment_amount" required>
+                                    </div>
+                                    <div class="mb-3">
+                                        <label for="payment_note" class="form-label">備考</label>
+                                        <textarea class="form-control" id="payment_note" name="payment_note" rows="3"></textarea>
+                                    </div>
+                                    <input type="hidden" name="vendor_name" value="{vendor_name}">
+                                    <input type="hidden" name="is_contract" value="true">
+                                    <input type="hidden" name="note" value="出来高支払">
+                                    <div class="text-end">
+                                        <button type="submit" class="btn btn-primary">登録</button>
+                                    </div>
+                                </form>
+                            </div>
+                        </div>
+                    </div>
+                </div>
+
+                <!-- 業者編集モーダル -->
+                <div class="modal fade" id="editVendorModal{budget.id}_{vendor_name.replace(" ", "_")}" tabindex="-1">
+                    <div class="modal-dialog">
+                        <div class="modal-content">
+                            <div class="modal-header">
+                                <h5 class="modal-title">業者情報編集</h5>
+                                <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
+                            </div>
+                            <div class="modal-body">
+                                <form action="/budget/{budget.id}/vendor/edit" method="POST">
+                                    <div class="mb-3">
+                                        <label for="vendor_name" class="form-label">業者名</label>
+                                        <input type="text" class="form-control" id="vendor_name" name="vendor_name" value="{vendor_name}" required>
+                                    </div>
+                                    <div class="mb-3">
+                                        <label for="contract_amount" class="form-label">請負額</label>
+                                        <input type="number" class="form-control" id="contract_amount" name="contract_amount" value="{vendor_total}" required>
+                                    </div>
+                                    <input type="hidden" name="old_vendor_name" value="{vendor_name}">
+                                    <div class="text-end">
+                                        <button type="submit" class="btn btn-primary">更新</button>
+                                    </div>
+                                </form>
+                            </div>
+                        </div>
+                    </div>
+                </div>
+
+                <!-- 業者削除確認モーダル -->
+                <div class="modal fade" id="deleteVendorModal{budget.id}_{vendor_name.replace(" ", "_")}" tabindex="-1">
+                    <div class="modal-dialog">
+                        <div class="modal-content">
+                            <div class="modal-header">
+                                <h5 class="modal-title">業者削除の確認</h5>
+                                <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
+                            </div>
+                            <div class="modal-body">
+                                <p>業者「{vendor_name}」の支払い情報を削除してもよろしいですか？</p>
+                                <p class="text-danger">この操作は取り消せません。</p>
+                            </div>
+                            <div class="modal-footer">
+                                <form action="/budget/{budget.id}/vendor/delete" method="POST">
+                                    <input type="hidden" name="vendor_name" value="{vendor_name}">
+                                    <button type="button" class="btn btn-secondary" data-bs-dismiss="modal">キャンセル</button>
+                                    <button type="submit" class="btn btn-danger">削除</button>
+                                </form>
+                            </div>
+                        </div>
+                    </div>
+                </div>'''
+                vendor_cards.append(vendor_card)
+        
+            # 全体のHTML生成
+            contract_payments_html = f'''
+            <div class="col-md-6">
+                <h6 class="mb-2">請負支払</h6>
+                {''.join(vendor_cards)}
+                <div class="card mb-3">
+                    <div class="card-body">
+                        <div class="row">
+                            <div class="col">
+                                <div>請負支払合計: {contract_total:,}円</div>
+                            </div>
+                        </div>
+                    </div>
+                </div>
+            </div>'''
+
+        # 出来高支払いの処理
+        if vendor_groups.progress_vendors:
+            # 業者ごとのHTML生成
+            progress_vendor_cards = []
+            for vendor_name, _, vendor_payments, _ in vendor_groups.progress_vendors:
+                # 支払い履歴の行を生成
+                payment_rows = []
+                for p in vendor_payments:
+                    payment_rows.append(
+                        f'''<tr>
+                            <td>{p.year}年{p.month}月</td>
+                            <td>{p.amount:,}円</td>
+                            <td>{p.note or ""}</td>
+                            <td>
+                                <div class="btn-group" role="group">
+                                    <button type="button" class="btn btn-sm btn-warning" data-bs-toggle="modal" data-bs-target="#editPaymentModal{p.id}">編集</button>
+                                    <button type="button" class="btn btn-sm btn-danger" data-bs-toggle="modal" data-bs-target="#deletePaymentModal{p.id}">削除</button>
+                                </div>
+                            </td>
+                        </tr>'''
+                    )
+            
+                # 業者カードを生成
+                vendor_card = f'''
+                <div class="card mb-3">
+                    <div class="card-header">
+                        <span class="fw-bold">{vendor_name}</span>
+                    </div>
+                    <div class="card-body p-0">
+                        <table class="table table-sm mb-0">
+                            <thead><tr><th>年月</th><th>金額</th><th>備考</th><th>操作</th></tr></thead>
+                            <tbody>
+                                {''.join(payment_rows)}
+                                <tr class="table-info">
+                                    <td class="text-end">出来高支払合計</td>
+                                    <td>{sum(p.amount for p in vendor_payments):,}円</td>
+                                    <td colspan="2"></td>
+                                </tr>
+                            </tbody>
+                        </table>
+                    </div>
+                </div>'''
+                progress_vendor_cards.append(vendor_card)
+        
+            # 出来高支払い全体のHTML生成
+            progress_payments_html = f'''
+            <div class="col-md-6">
+                <h6 class="mb-2">出来高支払</h6>
+                {''.join(progress_vendor_cards)}
+                <div class="card mb-3">
+                    <div class="card-body">
+                        <div class="row">
+                            <div class="col">
+                                <div>出来高支払合計: {progress_total:,}円</div>
+                                <div>工種請負残額: {contract_remaining:,}円</div>
+                            </div>
+                        </div>
+                    </div>
+                </div>
+            </div>'''
+
+        # 支払い情報の表示
+        payments_display = f'''
+        <div class="row">
+            {contract_payments_html}
+            {progress_payments_html}
+            {non_contract_payments_html}
+        </div>
+        '''
+
+        budgets_html += f'''
+        <tr>
+            <td colspan="5">
+                <div class="card mb-4" id="budget_{budget.id}">
+                    <div class="card-header bg-primary text-white">
+                        <h4 class="mb-0">{budget.code} - {budget.name}</h4>
+                    </div>
+                    <div class="card-body">
+                        <div class="row mb-3">
+                            <div class="col">
+                                <h5>予算金額: {budget.amount:,}円</h5>
+                            </div>
+                        </div>
+                        <div class="row">
+                            <div class="col">
+                                <div>請負支払計: {contract_total:,}円</div>
+                                <div>出来高支払計: {progress_total:,}円</div>
+                                <div>請負外支払計: {non_contract_total:,}円</div>
+                                <div>支払残: {contract_remaining:,}円</div>
+                            </div>
+                            <div class="col text-end">
+                                <div class="btn-group" role="group">
+                                    <button type="button" class="btn btn-info" data-bs-toggle="modal" data-bs-target="#paymentModal{budget.id}">
+                                        支払い入力
+                                    </button>
+                                    <button type="button" class="btn btn-warning" data-bs-toggle="modal" data-bs-target="#editBudgetModal{budget.id}">
+                                        編集
+                                    </button>
+                                    <button type="button" class="btn btn-danger" data-bs-toggle="modal" data-bs-target="#deleteBudgetModal{budget.id}">
+                                        削除
+                                    </button>
+                                </div>
+                            </div>
+                        </div>
+                        {payments_display}
+
+                        <!-- 支払い入力モーダル -->
+                        <div class="modal fade" id="paymentModal{budget.id}" tabindex="-1">
+                            <div class="modal-dialog">
+                                <div class="modal-content">
+                                    <div class="modal-header">
+                                        <h5 class="modal-title">支払い入力</h5>
+                                        <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
+                                    </div>
+                                    <div class="modal-body">
+                                        <form action="/budget/{budget.id}/payment/add" method="POST">
+                                            <div class="row mb-3">
+                                                <div class="col">
+                                                    <label for="payment_year" class="form-label">年</label>
+                                                    <select class="form-select" id="payment_year" name="payment_year" required>
+                                                        {''.join(year_options)}
+                                                    </select>
+                                                </div>
+                                                <div class="col">
+                                                    <label for="payment_month" class="form-label">月</label>
+                                                    <select class="form-select" id="payment_month" name="payment_month" required>
+                                                        {''.join(month_options)}
+                                                    </select>
+                                                </div>
+                                            </div>
+                                            <div class="mb-3">
+                                                <label for="vendor_name" class="form-label">業者名</label>
+                                                <input type="text" class="form-control" id="vendor_name" name="vendor_name" required>
+                                            </div>
+                                            <div class="mb-3">
+                                                <label for="payment_amount" class="form-label">金額</label>
+                                                <input type="number" class="form-control" id="payment_amount" name="payment_amount" required>
+                                            </div>
+                                            <div class="mb-3">
+                                                <div class="form-check">
+                                                    <input class="form-check-input" type="radio" name="is_contract" id="is_contract_true{budget.id}" value="true" checked>
+                                                    <label class="form-check-label" for="is_contract_true{budget.id}">
+                                                        請負
+                                                    </label>
+                                                </div>
+                                                <div class="form-check">
+                                                    <input class="form-check-input" type="radio" name="is_contract" id="is_contract_false{budget.id}" value="false">
+                                                    <label class="form-check-label" for="is_contract_false{budget.id}">
+                                                        請負外
+                                                    </label>
+                                                </div>
+                                            </div>
+                                            <div class="mb-3">
+                                                <label for="payment_note" class="form-label">備考</label>
+                                                <textarea class="form-control" id="payment_note" name="payment_note" rows="3"></textarea>
+                                            </div>
+                                            <div class="text-end">
+                                                <button type="submit" class="btn btn-primary">登録</button>
+                                            </div>
+                                        </form>
+                                    </div>
+                                </div>
+                            </div>
+                        </div>
+
+                        <!-- 工種編集モーダル -->
+                        <div class="modal fade" id="editBudgetModal{budget.id}" tabindex="-1">
+                            <div class="modal-dialog">
+                                <div class="modal-content">
+                                    <div class="modal-header">
+                                        <h5 class="modal-title">工種編集</h5>
+                                        <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
+                                    </div>
+                                    <div class="modal-body">
+                                        <form action="/budget/{budget.id}/edit" method="POST">
+                                            <div class="mb-3">
+                                                <label for="code" class="form-label">工種コード</label>
+                                                <select class="form-select" id="code" name="code" onchange="updateConstructionName(this)" required>
+                                                    <option value="">工種を選択してください</option>
+''' + '\n'.join([f'                                                            <option value="{code}" data-name="{name}" {"selected" if code == budget.code else ""}>{code} - {name}</option>' for code, name in CONSTRUCTION_TYPES.items()]) + '''
+                                                </select>
+                                            </div>
+                                            <div class="mb-3">
+                                                <label for="name" class="form-label">工種名</label>
+                                                <input type="text" class="form-control" id="name" name="name" value="{budget.name}" readonly required>
+                                            </div>
+                                            <div class="mb-3">
+                                                <label for="amount" class="form-label">金額</label>
+                                                <input type="number" class="form-control" id="amount" name="amount" value="{budget.amount}" required>
+                                            </div>
+                                            <div class="text-end">
+                                                <button type="submit" class="btn btn-primary">更新</button>
+                                            </div>
+                                        </form>
+                                    </div>
+                                </div>
+                            </div>
+                        </div>
+
+                        <!-- 工種削除確認モーダル -->
+                        <div class="modal fade" id="deleteBudgetModal{budget.id}" tabindex="-1">
+                            <div class="modal-dialog">
+                                <div class="modal-content">
+                                    <div class="modal-header">
+                                        <h5 class="modal-title">工種削除の確認</h5>
+                                        <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
+                                    </div>
+                                    <div class="modal-body">
+                                        <p>工種「{budget.name}」を削除してもよろしいですか？</p>
+                                        <p class="text-danger">この操作は取り消せません。</p>
+                                    </div>
+                                    <div class="modal-footer">
+                                        <form action="/budget/{budget.id}/delete" method="POST">
+                                            <button type="button" class="btn btn-secondary" data-bs-dismiss="modal">キャンセル</button>
+                                            <button type="submit" class="btn btn-danger">削除</button>
+                                        </form>
+                                    </div>
+                                </div>
+                            </div>
+                        </div>
+                    </div>
+                </div>
+            </td>
+        </tr>
+        '''
+
+    return f'''
+    <!DOCTYPE html>
+    <html lang="ja">
+    <head>
+        <meta charset="utf-8">
+        <title>{property.name} - 工種一覧 - 予算管理システム</title>
+        <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
+    </head>
+    <body>
+        <nav class="navbar navbar-expand-lg navbar-dark bg-primary">
+            <div class="container">
+                <a class="navbar-brand" href="/">予算管理システム</a>
+                <div class="navbar-nav ms-auto">
+                    <a class="nav-link" href="/budgets">物件一覧</a>
+                    <a class="nav-link" href="/logout">ログアウト</a>
+                </div>
+            </div>
+        </nav>
+    
+        <div class="container mt-4">
+            <div class="row mb-4">
+                <div class="col">
+                    <h2>{property.name} - 工種一覧</h2>
+                    <p>契約金額: {property.contract_amount:,}円 / 予算金額: {property.budget_amount:,}円</p>
+                    <p>工種合計: {total_amount:,}円</p>
+                </div>
+                <div class="col text-end">
+                    <button type="button" class="btn btn-primary" data-bs-toggle="modal" data-bs-target="#addBudgetModal">
+                        新規工種登録
+                    </button>
+                </div>
+            </div>
+        
+            <div class="table-responsive">
+                <table class="table table-striped">
+                    <thead>
+                        <tr>
+                            <th>工種コード</th>
+                            <th>工種名</th>
+                            <th>予算金額</th>
+                            <th>支払状況</th>
+                            <th>操作</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+                        {budgets_html}
+                    </tbody>
+                </table>
+            </div>
+        </div>
+
+        <!-- 新規工種登録モーダル -->
+        <div class="modal fade" id="addBudgetModal" tabindex="-1">
+            <div class="modal-dialog">
+                <div class="modal-content">
+                    <div class="modal-header">
+                        <h5 class="modal-title">新規工種登録</h5>
+                        <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
+                    </div>
+                    <div class="modal-body">
+                        <form action="/property/{property.id}/budget/add" method="POST">
+                            <div class="mb-3">
+                                <label for="code" class="form-label">工種コード</label>
+                                <select class="form-select" id="code" name="code" onchange="updateConstructionName(this)" required>
+                                    <option value="">工種を選択してください</option>
+''' + '\n'.join([f'                                            <option value="{code}" data-name="{name}">{code} - {name}</option>' for code, name in CONSTRUCTION_TYPES.items()]) + '''
+                                </select>
+                            </div>
+                            <div class="mb-3">
+                                <label for="name" class="form-label">工種名</label>
+                                <input type="text" class="form-control" id="name" name="name" readonly required>
+                            </div>
+                            <div class="mb-3">
+                                <label for="amount" class="form-label">金額</label>
+                                <input type="number" class="form-control" id="amount" name="amount" required>
+                            </div>
+                            <div class="text-end">
+                                <button type="submit" class="btn btn-primary">登録</button>
+                            </div>
+                        </form>
+                    </div>
+                </div>
+            </div>
+        </div>
+
+        <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
+        <script>
+            function updateConstructionName(selectElement) {
+                const nameInput = selectElement.closest('.modal-body').querySelector('[name="name"]');
+                const selectedOption = selectElement.options[selectElement.selectedIndex];
+                nameInput.value = selectedOption.value ? selectedOption.dataset.name : '';
+            }
+        </script>
+    </body>
+    </html>
+    '''
+
+
+def render_jinja(property, summaries, vendor_groups_by_budget):
+    """Jinja テンプレートによる描画（フラグメントキャッシュなし）"""
+    ctx = property_page_context()
+    budget_card = get_template_attribute('_budget_macros.html', 'budget_card')
+    return render_template(
+        'property_detail.html',
+        property=property,
+        budget_cards=[
+            budget_card(summary, vendor_groups_by_budget.get(summary.budget.id, EMPTY_VENDOR_GROUPS), ctx)
+            for summary in summaries
+        ],
+        total_amount=sum(summary.budget.amount for summary in summaries),
+        ctx=ctx
+    )
+
+
+def render_jinja_cached(property, summaries, vendor_groups_by_budget):
+    """Jinja テンプレートによる描画（フラグメントキャッシュ使用、ウォームアップ後は全件ヒット）"""
+    ctx = property_page_context()
+    return render_template(
+        'property_detail.html',
+        property=property,
+        budget_cards=render_budget_cards(property.id, summaries, ctx),
+        total_amount=sum(summary.budget.amount for summary in summaries),
+        ctx=ctx
+    )
+
+
+def measure(render, args, repeat):
+    """最短描画時間・ピークメモリ・出力サイズを計測する"""
+    render(*args)  # テンプレートのコンパイル等を除外するためのウォームアップ
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        html = render(*args)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    render(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, len(html.encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budgets', type=int, default=100)
+    parser.add_argument('--payments', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    options = parser.parse_args()
+
+    try:
+        with app.test_request_context():
+            property = seed(options.budgets, options.payments)
+            summaries = get_budget_summaries(property.id)
+            vendor_groups_by_budget = get_vendor_groups(property.id)
+            args = (property, summaries, vendor_groups_by_budget)
+
+            print(f'工種数: {options.budgets} / 支払い件数: {options.payments}')
+            print(f'{"方式":<10}{"描画時間(ms)":>14}{"ピークメモリ(KiB)":>20}{"出力(KiB)":>12}')
+            for label, render in (('f-string', render_fstring), ('jinja', render_jinja), ('cached', render_jinja_cached)):
+                seconds, peak, size = measure(render, args, options.repeat)
+                print(f'{label:<10}{seconds * 1000:>14.1f}{peak / 1024:>20.0f}{size / 1024:>12.0f}')
+    finally:
+        remove_database()
+
+
+if __name__ == '__main__':
+    main()
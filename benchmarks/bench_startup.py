@@ -0,0 +1,111 @@
+"""create_app の起動時間ベンチマーク
+
+起動時にスキーマを検査していた旧実装（テーブル一覧・全テーブルのカラム取得・SELECT 1）と、
+スキーマ変更をマイグレーションに移した現在の create_app を比較する。
+マイグレーション適用済みのデータベースに対して、アプリ作成ごとの時間・SQL数・接続数を計測する。
+既定では一時SQLiteを使い、--database-url で PostgreSQL などのデータベースも指定できる
+（カタログ問い合わせの往復はネットワーク越しのデータベースほど効く）。
+
+    python benchmarks/bench_startup.py [--repeat 20] [--database-url URL]
+"""
+import argparse
+import statistics
+import time
+
+from _common import use_database, remove_database, create_schema
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20, help='計測回数')
+    parser.add_argument('--database-url', help='使用するデータベース（既定: 一時SQLite）')
+    return parser.parse_args()
+
+
+args = parse_args()
+use_database(args.database_url)
+
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+from app import app, create_app
+from app.extensions import db
+
+counter = {'statements': 0, 'connections': 0}
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(*args):
+    counter['statements'] += 1
+
+
+@event.listens_for(Pool, 'connect')
+def _count_connection(*args):
+    counter['connections'] += 1
+
+
+def legacy_schema_check(app):
+    """旧実装の起動時処理（スキーマが最新の場合に毎回実行されていた部分）"""
+    with app.app_context():
+        inspector = inspect(db.engine)
+        existing_tables = inspector.get_table_names()
+        required_tables = {'user', 'property', 'construction_budget', 'payment'}
+        for table_name in required_tables:
+            if table_name in existing_tables:
+                [column['name'] for column in inspector.get_columns(table_name)]
+        if 'payment' in existing_tables:
+            {column['name'] for column in inspector.get_columns('payment')}
+        if 'construction_budget' in existing_tables:
+            {column['name'] for column in inspector.get_columns('construction_budget')}
+        db.session.execute(db.text('SELECT 1'))
+        db.session.remove()
+
+
+def boot_legacy():
+    legacy_schema_check(create_app())
+
+
+def boot_current():
+    create_app()
+
+
+def measure(boots, repeat):
+    """方式ごとの起動1回あたりの時間（中央値）・SQL数・接続数
+
+    プロセス内の状態の変化による偏りを避けるため、各方式を交互に実行する。
+    """
+    results = {label: {'timings': [], 'statements': 0, 'connections': 0} for label, _ in boots}
+    for label, boot in boots:
+        boot()  # インポート済みモジュールのキャッシュ等を揃えるためのウォームアップ
+    for _ in range(repeat):
+        for label, boot in boots:
+            counter.update(statements=0, connections=0)
+            start = time.perf_counter()
+            boot()
+            result = results[label]
+            result['timings'].append(time.perf_counter() - start)
+            result['statements'] += counter['statements']
+            result['connections'] += counter['connections']
+    return [
+        (label, statistics.median(result['timings']), result['statements'] / repeat, result['connections'] / repeat)
+        for label, result in results.items()
+    ]
+
+
+def main():
+    try:
+        with app.app_context():
+            create_schema()
+
+        print(f'{"方式":<10}{"起動時間(ms)":>14}{"SQL数":>10}{"接続数":>10}')
+        for label, seconds, statements, connections in measure(
+            (('legacy', boot_legacy), ('current', boot_current)), args.repeat
+        ):
+            print(f'{label:<10}{seconds * 1000:>14.2f}{statements:>10.1f}{connections:>10.1f}')
+    finally:
+        remove_database()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""主要クエリの実行計画をインデックス追加前後で比較する
+
+物件一覧・物件詳細・支払い履歴・業者の編集／削除で発行される実際のSQLを取得し、
+ホットパス用インデックス（migrations/versions/5f0c1d2a9b31）を削除した状態と
+作成した状態で EXPLAIN を出力する。既定では一時SQLiteを使い、
+--database-url で PostgreSQL などの空のデータベースも指定できる。
+
+    python benchmarks/explain_indexes.py [--properties 50] [--budgets 20] [--payments 50]
+"""
+import argparse
+import random
+
+from _common import use_database, remove_database, create_schema, seed_user, seed_property, payment_rows, insert_payments
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--properties', type=int, default=50, help='物件数')
+    parser.add_argument('--budgets', type=int, default=20, help='物件あたりの工種数')
+    parser.add_argument('--payments', type=int, default=50, help='工種あたりの支払い件数')
+    parser.add_argument('--database-url', help='使用するデータベース（既定: 一時SQLite）')
+    return parser.parse_args()
+
+
+args = parse_args()
+use_database(args.database_url)
+
+from sqlalchemy import event
+
+from app import app
+from app.extensions import db
+from app.models import User, Property, ConstructionBudget, Payment
+from app.summary import get_budget_summaries, get_property_rollups, get_vendor_groups, get_vendor_histories, vendor_totals
+
+# 比較対象のインデックス
+HOT_PATH_INDEXES = sorted(
+    (index for model in (Property, ConstructionBudget, Payment) for index in model.__table__.indexes),
+    key=lambda index: index.name
+)
+
+
+def seed():
+    """計測用の物件・工種・支払いを作成する"""
+    create_schema()
+    rnd = random.Random(0)
+    users = [seed_user(f'explain{i}') for i in range(10)]
+    rows = []
+    for i in range(args.properties):
+        _, budgets = seed_property(users[i % len(users)], code=f'EX{i:04d}', budget_count=args.budgets, name=f'物件{i}')
+        rows += payment_rows([budget.id for budget in budgets], args.budgets * args.payments, rnd)
+    insert_payments(rows)
+
+
+def capture_statements():
+    """各画面で発行されるSQLと引数を取得する"""
+    user = User.query.filter_by(username='explain0').one()
+    property = Property.query.filter_by(user_id=user.id).first()
+    budget = ConstructionBudget.query.filter_by(property_id=property.id).first()
+    vendor_name = Payment.query.filter_by(construction_budget_id=budget.id).first().vendor_name
+
+    scenarios = [
+        ('物件一覧（物件ごとの集計）', lambda: get_property_rollups(user.id)),
+        ('物件詳細（工種一覧）', lambda: get_budget_summaries(property.id)),
+        ('物件詳細（業者別の支払い）', lambda: get_vendor_groups(property.id)),
+        ('工種フラグメント（業者別の履歴）', lambda: get_vendor_histories(budget.id, 20)),
+        ('業者の編集', lambda: Payment.query.filter_by(
+            construction_budget_id=budget.id, vendor_name=vendor_name).all()),
+        ('業者の削除（集計の差し引き）', lambda: vendor_totals(budget.id, vendor_name)),
+    ]
+
+    statements = []
+    for label, run in scenarios:
+        captured = []
+
+        def listener(conn, cursor, statement, parameters, context, executemany):
+            captured.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            run()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        statements.extend((label, statement, parameters) for statement, parameters in captured)
+    return statements
+
+
+def explain(statement, parameters):
+    """実行計画を文字列で返す"""
+    prefix = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + statement, parameters).all()
+    if db.engine.dialect.name == 'sqlite':
+        return '\n'.join(row[-1] for row in rows)
+    return '\n'.join(row[0] for row in rows)
+
+
+def analyze():
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('ANALYZE')
+        conn.commit()
+
+
+def main():
+    try:
+        with app.app_context():
+            seed()
+            statements = capture_statements()
+
+            plans = {}
+            for phase in ('before', 'after'):
+                for index in HOT_PATH_INDEXES:
+                    if phase == 'before':
+                        index.drop(db.engine, checkfirst=True)
+                    else:
+                        index.create(db.engine, checkfirst=True)
+                analyze()
+                plans[phase] = [explain(statement, parameters) for _, statement, parameters in statements]
+
+            print(f'インデックス: {", ".join(index.name for index in HOT_PATH_INDEXES)}')
+            for i, (label, statement, _) in enumerate(statements):
+                print(f'\n=== {label} ===')
+                print(' '.join(statement.split()))
+                for phase in ('before', 'after'):
+                    print(f'--- {phase} ---')
+                    print(plans[phase][i])
+    finally:
+        remove_database()
+
+
+if __name__ == '__main__':
+    main()
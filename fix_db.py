@@ -1,22 +1,14 @@
-from app import create_app, db
-from app.models import User, Property, ConstructionBudget, Payment
-import sqlite3
+from flask_migrate import upgrade
 
-app = create_app()
+from app import app, db
+from init_db import MIGRATIONS_DIRECTORY
 
 with app.app_context():
-    # テーブルを再作成
+    # テーブルを削除し、マイグレーションで再作成する
+    # （管理者ユーザー admin は環境変数 INITIAL_ADMIN_PASSWORD が設定されている場合のみ作成される）
     db.drop_all()
-    db.create_all()
+    with db.engine.begin() as conn:
+        conn.execute(db.text('DROP TABLE IF EXISTS alembic_version'))
+    upgrade(directory=MIGRATIONS_DIRECTORY)
     
-    # 管理者ユーザーを作成
-    admin = User(
-        username='admin',
-        email='admin@example.com',
-        is_admin=True
-    )
-    admin.set_password('admin')
-    db.session.add(admin)
-    db.session.commit()
-    
-    print("データベースを再作成しました。") 
\ No newline at end of file
+    print("データベースを再作成しました。") 
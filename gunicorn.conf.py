@@ -0,0 +1,63 @@
+"""gunicorn の本番設定
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+ワーカー数・スレッド数は CPU 数から決め（ワーカー数は既定で最大4）、環境変数で上書きできる。
+preload_app でアプリを親プロセスで一度だけ読み込み、fork 後の子プロセスでは
+SQLAlchemy のコネクションプールを作り直して親の接続（ソケット）を共有しない。
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# このプロセスが使える CPU 数（コンテナではホストの CPU 数より少ないことがある）
+cpu_count = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+
+# ワーカー数（既定: CPU数 × 2 + 1、最大4）とワーカーあたりのスレッド数（既定: 1 = sync ワーカー）
+# ワーカーごとにコネクションプールを持つため、データベースへの接続数は最大で
+# ワーカー数 × (DB_POOL_SIZE + DB_MAX_OVERFLOW)（既定では 4 × (5 + 10) = 60）になる。
+# WEB_CONCURRENCY を増やす場合は、この値がデータベースの接続数の上限に収まるようにプールの設定も下げる。
+workers = int(os.environ.get('WEB_CONCURRENCY', min(cpu_count * 2 + 1, 4)))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# アプリを親プロセスで読み込み、メモリを copy-on-write で共有する
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# メモリ増加に備えて一定数のリクエストごとにワーカーを入れ替える（同時に入れ替わらないよう揺らぎを付ける）
+# gunicorn 21.2 の gthread ワーカーは入れ替え時に受け付け済みで未読の接続を破棄するため、
+# gthread では明示的に指定した場合のみ有効にする
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000 if worker_class == 'sync' else 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    # 読み込み済みのオブジェクトをGCの対象外にし、子プロセスでの参照カウント以外の書き込み（ページのコピー）を減らす
+    gc.collect()
+    gc.freeze()
+
+
+def pre_fork(server, worker):
+    # ワーカーの再起動時に備え、親プロセスでその後に作られたオブジェクトも対象外にする
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        return
+    # 親プロセスで作成された接続を子プロセスで使わないよう、プールを破棄して作り直す
+    # （close=False: 親の接続は閉じずに参照だけを捨てる）
+    from app import app
+    from app.extensions import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -1,24 +1,22 @@
-from app import db, app, User
-from werkzeug.security import generate_password_hash
+import os
+
+from flask_migrate import upgrade
+
+from app import app
+
+# マイグレーションのディレクトリ（実行時のカレントディレクトリによらない）
+MIGRATIONS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
 
 def init_db():
     with app.app_context():
-        # テーブルを作成
-        db.create_all()
+        # マイグレーションでテーブルを作成・更新する
+        # （管理者ユーザー admin は環境変数 INITIAL_ADMIN_PASSWORD が設定されている場合のみ、user テーブルの作成時に作成される）
+        upgrade(directory=MIGRATIONS_DIRECTORY)
         
-        # 初期管理者ユーザーの作成
-        if not User.query.filter_by(username='admin').first():
-            admin = User(
-                username='admin',
-                email='admin@example.com',
-                is_admin=True
-            )
-            admin.set_password('initial_password')
-            db.session.add(admin)
-            db.session.commit()
-            print("管理者ユーザーを作成しました")
+        if not os.environ.get('INITIAL_ADMIN_PASSWORD'):
+            print("INITIAL_ADMIN_PASSWORD が未設定のため、管理者ユーザーは作成していません")
         
         print("データベースの初期化が完了しました")
 
 if __name__ == '__main__':
-    init_db() 
\ No newline at end of file
+    init_db() 
@@ -4,6 +4,8 @@ from logging.config import fileConfig
 from flask import current_app
 
 from alembic import context
+from alembic.script import ScriptDirectory
+import sqlalchemy as sa
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -51,6 +53,33 @@ def get_metadata():
     return target_db.metadata
 
 
+def discard_unknown_revisions(migration_context):
+    """versions にないリビジョンの記録を削除する
+
+    マイグレーション導入前の Flask-Migrate の設定で作成されたデータベースには、
+    現在の versions にないリビジョン（例: 9746611f2204）が記録されており、そのままでは upgrade できない。
+    記録を削除して初期スキーマ（b8e4f1c07a2d）から適用し直す。各リビジョンは既存のテーブル・カラム・
+    インデックスを確認してから変更するため、既存のスキーマには不足分だけが追加される。
+    """
+    known_revisions = {script.revision for script in ScriptDirectory.from_config(config).walk_revisions()}
+    unknown_revisions = [
+        revision for revision in migration_context.get_current_heads()
+        if revision not in known_revisions
+    ]
+    if not unknown_revisions:
+        return
+    logger.warning('Discarding unknown revision(s) %s; re-applying migrations from the initial schema.',
+                   ', '.join(unknown_revisions))
+    version_table = sa.table(
+        migration_context.version_table,
+        sa.column('version_num'),
+        schema=migration_context.version_table_schema
+    )
+    migration_context.connection.execute(
+        version_table.delete().where(version_table.c.version_num.in_(unknown_revisions))
+    )
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -104,6 +133,7 @@ def run_migrations_online():
         )
 
         with context.begin_transaction():
+            discard_unknown_revisions(context.get_context())
             context.run_migrations()
 
 
@@ -0,0 +1,41 @@
+"""add hot path indexes
+
+物件一覧・物件詳細・業者の編集／削除が絞り込む外部キー列にインデックスを追加する。
+PostgreSQL では書き込みを止めないよう CREATE INDEX CONCURRENTLY で作成する。
+
+Revision ID: 5f0c1d2a9b31
+Revises: b8e4f1c07a2d
+Create Date: 2026-10-18 12:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f0c1d2a9b31'
+down_revision = 'b8e4f1c07a2d'
+branch_labels = None
+depends_on = None
+
+# (インデックス名, テーブル名, カラム)
+INDEXES = [
+    ('ix_property_user_id', 'property', ['user_id']),
+    ('ix_construction_budget_property_id', 'construction_budget', ['property_id']),
+    ('ix_payment_budget_vendor', 'payment', ['construction_budget_id', 'vendor_name']),
+    ('ix_payment_budget_is_contract', 'payment', ['construction_budget_id', 'is_contract']),
+]
+
+
+def upgrade():
+    # CONCURRENTLY はトランザクション内で実行できないため autocommit で作成する
+    # （db.create_all で作成済みの場合はスキップする）
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
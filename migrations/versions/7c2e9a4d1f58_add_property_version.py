@@ -0,0 +1,33 @@
+"""add property version
+
+物件に版数カラムを追加する。工種・支払いの変更ごとにアプリケーションが加算し、
+物件詳細・物件一覧の ETag に使う。
+
+Revision ID: 7c2e9a4d1f58
+Revises: d3a91c6e5b70
+Create Date: 2026-10-18 14:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e9a4d1f58'
+down_revision = 'd3a91c6e5b70'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all で作成済みの場合はスキップする
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('property')}
+    if 'version' in columns:
+        return
+
+    op.add_column('property', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('property') as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,115 @@
+"""initial schema
+
+ユーザー・物件・工種・支払いのテーブルを作成する。
+マイグレーション導入前に db.create_all で作成されたデータベースでは
+既存のテーブルはそのまま残し、旧バージョンの payment テーブルに不足しているカラムのみを追加する。
+環境変数 INITIAL_ADMIN_PASSWORD が設定されている場合のみ、user テーブルの作成時に管理者ユーザー admin を作成する。
+
+Revision ID: b8e4f1c07a2d
+Revises:
+Create Date: 2026-10-18 12:35:00.000000
+
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+from werkzeug.security import generate_password_hash
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4f1c07a2d'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing_tables = set(inspector.get_table_names())
+
+    if 'user' not in existing_tables:
+        user = op.create_table(
+            'user',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=80), nullable=False),
+            sa.Column('email', sa.String(length=120), nullable=False),
+            sa.Column('password_hash', sa.String(length=512), nullable=True),
+            sa.Column('is_admin', sa.Boolean(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('email'),
+            sa.UniqueConstraint('username')
+        )
+        # 管理者ユーザーの作成（テーブル作成時のみ。パスワードは環境変数で指定し、未設定なら作成しない）
+        admin_password = os.environ.get('INITIAL_ADMIN_PASSWORD')
+        if admin_password:
+            op.bulk_insert(user, [{
+                'username': 'admin',
+                'email': 'admin@example.com',
+                'password_hash': generate_password_hash(admin_password),
+                'is_admin': True
+            }])
+
+    if 'property' not in existing_tables:
+        op.create_table(
+            'property',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('code', sa.String(length=20), nullable=False),
+            sa.Column('name', sa.String(length=200), nullable=False),
+            sa.Column('contract_amount', sa.Integer(), nullable=False),
+            sa.Column('budget_amount', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('code')
+        )
+
+    if 'construction_budget' not in existing_tables:
+        op.create_table(
+            'construction_budget',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('code', sa.String(length=20), nullable=False),
+            sa.Column('name', sa.String(length=200), nullable=False),
+            sa.Column('amount', sa.Integer(), nullable=False),
+            sa.Column('property_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['property_id'], ['property.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'payment' not in existing_tables:
+        op.create_table(
+            'payment',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('year', sa.Integer(), nullable=False),
+            sa.Column('month', sa.Integer(), nullable=False),
+            sa.Column('vendor_name', sa.String(length=200), nullable=False),
+            sa.Column('amount', sa.Integer(), nullable=False),
+            sa.Column('is_contract', sa.Boolean(), nullable=False),
+            sa.Column('payment_type', sa.String(length=50), nullable=False),
+            sa.Column('note', sa.Text(), nullable=True),
+            sa.Column('construction_budget_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['construction_budget_id'], ['construction_budget.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+    else:
+        # 旧バージョンの payment テーブルに不足しているカラムを追加
+        columns = {column['name'] for column in inspector.get_columns('payment')}
+        if 'payment_type' not in columns:
+            op.add_column('payment', sa.Column('payment_type', sa.String(length=50), nullable=False, server_default='請負'))
+        if 'is_contract' not in columns:
+            op.add_column('payment', sa.Column('is_contract', sa.Boolean(), nullable=False, server_default=sa.true()))
+        if 'note' not in columns:
+            op.add_column('payment', sa.Column('note', sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_table('payment')
+    op.drop_table('construction_budget')
+    op.drop_table('property')
+    op.drop_table('user')
@@ -0,0 +1,73 @@
+"""add budget payment totals
+
+工種に支払集計カラム（請負・出来高・請負外）を追加し、既存の支払いから集計する。
+以降は支払いの変更と同じトランザクションでアプリケーションが差分更新する。
+
+Revision ID: d3a91c6e5b70
+Revises: 5f0c1d2a9b31
+Create Date: 2026-10-18 13:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a91c6e5b70'
+down_revision = '5f0c1d2a9b31'
+branch_labels = None
+depends_on = None
+
+# 出来高支払として扱う備考（app.summary.PROGRESS_NOTE と同じ値）
+PROGRESS_NOTE = '出来高支払'
+
+SUMMARY_COLUMNS = ('contract_total', 'progress_total', 'non_contract_total')
+
+construction_budget = sa.table(
+    'construction_budget',
+    sa.column('id', sa.Integer),
+    *(sa.column(column, sa.Integer) for column in SUMMARY_COLUMNS)
+)
+payment = sa.table(
+    'payment',
+    sa.column('construction_budget_id', sa.Integer),
+    sa.column('amount', sa.Integer),
+    sa.column('is_contract', sa.Boolean),
+    sa.column('note', sa.Text)
+)
+
+
+def _total(condition):
+    return sa.func.coalesce(
+        sa.select(sa.func.sum(payment.c.amount)).where(
+            payment.c.construction_budget_id == construction_budget.c.id,
+            condition
+        ).scalar_subquery(),
+        0
+    )
+
+
+def upgrade():
+    # マイグレーション導入前の起動時処理で追加済みの場合はスキップする
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('construction_budget')}
+    missing_columns = [column for column in SUMMARY_COLUMNS if column not in columns]
+    if not missing_columns:
+        return
+
+    for column in missing_columns:
+        op.add_column('construction_budget', sa.Column(column, sa.Integer(), nullable=False, server_default='0'))
+
+    op.execute(construction_budget.update().values(
+        contract_total=_total(sa.and_(
+            payment.c.is_contract.is_(True),
+            sa.or_(payment.c.note.is_(None), payment.c.note != PROGRESS_NOTE)
+        )),
+        progress_total=_total(sa.and_(payment.c.is_contract.is_(True), payment.c.note == PROGRESS_NOTE)),
+        non_contract_total=_total(payment.c.is_contract.is_(False))
+    ))
+
+
+def downgrade():
+    with op.batch_alter_table('construction_budget') as batch_op:
+        for column in reversed(SUMMARY_COLUMNS):
+            batch_op.drop_column(column)
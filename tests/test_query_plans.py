@@ -0,0 +1,185 @@
+"""主要クエリの実行計画がホットパス用インデックスを使うことを確かめる
+
+物件一覧・物件詳細・支払い履歴・業者の編集／削除（app パッケージ）と、
+工種一覧の利益計上フラグ・出来高払い（旧 app.py）で発行されるSQLを
+一時SQLiteで EXPLAIN QUERY PLAN し、計画にインデックス名が現れることを検証する。
+
+    python -m pytest -q tests/test_query_plans.py
+"""
+import importlib.util
+import logging
+import os
+import random
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine, event
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+_db_file.close()
+os.environ['DATABASE_URL'] = f'sqlite:///{_db_file.name}'
+logging.disable(logging.INFO)
+
+from app import app, CONSTRUCTION_TYPES
+from app.extensions import db
+from app.models import User, Property, ConstructionBudget, Payment
+from app.summary import (
+    get_budget_summaries, get_property_rollups, get_vendor_groups,
+    get_vendor_histories, rebuild_budget_totals, vendor_totals
+)
+
+# (画面, 発行されるクエリ, 実行計画に現れるべきインデックス)
+HOT_QUERIES = [
+    ('物件一覧（物件ごとの集計）', lambda seeded: get_property_rollups(seeded['user_id']),
+     ['ix_property_user_id', 'ix_construction_budget_property_id']),
+    ('物件詳細（工種一覧）', lambda seeded: get_budget_summaries(seeded['property_id']),
+     ['ix_construction_budget_property_id']),
+    ('物件詳細（業者別の支払い）', lambda seeded: get_vendor_groups(seeded['property_id']),
+     ['ix_construction_budget_property_id', 'ix_payment_budget_is_contract']),
+    ('工種フラグメント（業者別の履歴）', lambda seeded: get_vendor_histories(seeded['budget_id'], 20),
+     ['ix_payment_budget_vendor', 'ix_payment_budget_is_contract']),
+    ('業者の編集', lambda seeded: Payment.query.filter_by(
+        construction_budget_id=seeded['budget_id'], vendor_name=seeded['vendor_name']).all(),
+     ['ix_payment_budget_vendor']),
+    ('業者の削除（集計の差し引き）', lambda seeded: vendor_totals(seeded['budget_id'], seeded['vendor_name']),
+     ['ix_payment_budget_vendor']),
+]
+
+
+def explain(engine, statement, parameters=()):
+    """実行計画を文字列で返す"""
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    return '\n'.join(row[-1] for row in rows)
+
+
+@pytest.fixture(scope='module')
+def seeded():
+    """物件・工種・支払いを作成し、統計情報を更新する"""
+    with app.app_context():
+        db.create_all()
+        rnd = random.Random(0)
+        users = [User(username=f'plan{i}', email=f'plan{i}@example.com') for i in range(5)]
+        db.session.add_all(users)
+        db.session.flush()
+
+        codes = list(CONSTRUCTION_TYPES.items())
+        for i in range(20):
+            property = Property(code=f'PL{i:04d}', name=f'物件{i}', contract_amount=10 ** 9,
+                                budget_amount=9 * 10 ** 8, user_id=users[i % len(users)].id)
+            db.session.add(property)
+            db.session.flush()
+            for j in range(5):
+                code, name = codes[j % len(codes)]
+                budget = ConstructionBudget(code=code, name=name, amount=10 ** 7, property_id=property.id)
+                db.session.add(budget)
+                db.session.flush()
+                for _ in range(20):
+                    kind = rnd.choice(['contract', 'progress', 'non_contract'])
+                    db.session.add(Payment(
+                        year=rnd.randint(2021, 2025),
+                        month=rnd.randint(1, 12),
+                        vendor_name=f'業者{rnd.randint(1, 8)}',
+                        amount=rnd.randint(1, 500) * 1000,
+                        is_contract=kind != 'non_contract',
+                        note='出来高支払' if kind == 'progress' else None,
+                        construction_budget_id=budget.id
+                    ))
+        db.session.commit()
+        rebuild_budget_totals()
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('ANALYZE')
+            conn.commit()
+
+        user = User.query.filter_by(username='plan0').one()
+        property = Property.query.filter_by(user_id=user.id).first()
+        budget = ConstructionBudget.query.filter_by(property_id=property.id).first()
+        yield {
+            'user_id': user.id,
+            'property_id': property.id,
+            'budget_id': budget.id,
+            'vendor_name': Payment.query.filter_by(construction_budget_id=budget.id).first().vendor_name,
+        }
+        db.session.remove()
+        db.engine.dispose()
+    os.unlink(_db_file.name)
+
+
+@pytest.mark.parametrize('label, run, expected_indexes', HOT_QUERIES, ids=[query[0] for query in HOT_QUERIES])
+def test_hot_query_uses_index(seeded, label, run, expected_indexes):
+    with app.app_context():
+        captured = []
+
+        def listener(conn, cursor, statement, parameters, context, executemany):
+            captured.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            run(seeded)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        assert captured, f'{label}: SQLが発行されていない'
+        plan = '\n'.join(explain(db.engine, statement, parameters) for statement, parameters in captured)
+    for index_name in expected_indexes:
+        assert f'INDEX {index_name}' in plan, f'{label}: {index_name} が使われていない\n{plan}'
+
+
+@pytest.fixture(scope='module')
+def legacy():
+    """旧 app.py を読み込み、そのテーブルを別のインメモリSQLiteに作成する
+
+    旧 app.py は app パッケージと同名のため、ファイルを直接読み込む。
+    接続先は instance/yosan.db に固定されるので、クエリは組み立てるだけで実行しない。
+    """
+    spec = importlib.util.spec_from_file_location('legacy_app', os.path.join(ROOT, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    engine = create_engine('sqlite://')
+    module.db.metadata.create_all(engine)
+    yield module, engine
+    engine.dispose()
+
+
+def legacy_plan(legacy, build_query, engine=None):
+    module, default_engine = legacy
+    engine = engine or default_engine
+    with module.app.app_context():
+        statement = build_query(module).statement
+    sql = str(statement.compile(engine, compile_kwargs={'literal_binds': True}))
+    return explain(engine, sql)
+
+
+def test_profit_work_type_ids_uses_partial_index(legacy):
+    plan = legacy_plan(legacy, lambda module: module.profit_work_type_ids_query([1, 2, 3]))
+    assert 'INDEX ix_payments_profit_work_type_id' in plan, plan
+
+
+def test_progress_payments_use_contract_index(legacy):
+    plan = legacy_plan(legacy, lambda module: module.progress_payments_query([1, 2, 3]))
+    assert 'INDEX ix_payments_contract_id_year_month' in plan, plan
+
+
+# (既存のデータベースに後から追加するインデックス, そのインデックスを使うクエリ)
+LEGACY_ADDED_INDEXES = [
+    ('ix_payments_profit_work_type_id', lambda module: module.profit_work_type_ids_query([1, 2, 3])),
+    ('ix_payments_contract_id_year_month', lambda module: module.progress_payments_query([1, 2, 3])),
+]
+
+
+@pytest.mark.parametrize('index_name, build_query', LEGACY_ADDED_INDEXES, ids=[index[0] for index in LEGACY_ADDED_INDEXES])
+def test_create_missing_indexes_adds_index_to_existing_tables(legacy, index_name, build_query):
+    module, _ = legacy
+    engine = create_engine('sqlite://')
+    module.db.metadata.create_all(engine)
+    # インデックスの追加前に作成されたテーブルを再現する
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f'DROP INDEX {index_name}')
+
+    assert module.create_missing_indexes(engine) == [index_name]
+    assert module.create_missing_indexes(engine) == []
+    plan = legacy_plan(legacy, build_query, engine)
+    assert f'INDEX {index_name}' in plan, plan
+    engine.dispose()